@@ -0,0 +1,105 @@
+"""
+Key generation benchmark.
+
+Compares key throughput of the legacy per-character generator, the random allocator and the
+sequence allocator (plain and scrambled), and estimates the first-try insert success rate of
+random keys as the table grows to `--rows` rows.
+
+    python -m benchmarks.keygen_bench --rows 10000000
+"""
+import argparse
+import json
+import secrets
+import string
+import time
+from typing import Callable, Dict
+
+from src.db.keygen import FeistelPermutation, RANDOM_ALPHABET, base62_encode, create_random_key
+
+
+def legacy_random_key(length: int = 8) -> str:
+    chars = string.ascii_uppercase + string.digits
+    return "".join(secrets.choice(chars) for _ in range(length))
+
+
+def measure(generate: Callable[[int], str], count: int) -> float:
+    start = time.perf_counter()
+    for index in range(count):
+        generate(index)
+    return count / (time.perf_counter() - start)
+
+
+def throughput(count: int, length: int) -> Dict[str, float]:
+    permutation = FeistelPermutation(secrets.token_hex(16), length)
+    return {
+        "legacy_random": measure(lambda _: legacy_random_key(length), count),
+        "random": measure(lambda _: create_random_key(length), count),
+        "sequence": measure(lambda index: base62_encode(index + 1), count),
+        "sequence_scrambled": measure(lambda index: base62_encode(permutation.permute(index + 1), length), count),
+    }
+
+
+def random_success_rate(rows: int, key_space: int, retries: int) -> Dict[str, float]:
+    """
+    Expected share of inserts that succeed while the table fills from 0 to `rows` random keys.
+    An insert into a table holding n keys collides with probability n / key_space.
+    """
+    first_try = 1 - rows / (2 * key_space)
+    # Averaging (n / K) ** (retries + 1) over n in [0, rows].
+    failure_after_retries = (rows / key_space) ** (retries + 1) / (retries + 2)
+    return {"first_try": first_try, "with_retries": 1 - failure_after_retries}
+
+
+def simulate_random(rows: int, length: int) -> float:
+    """
+    Fill a set with random keys of a short length and count first-try successes, to check the
+    analytic estimate on a key space small enough to simulate.
+    """
+    seen = set()
+    successes = 0
+    for _ in range(rows):
+        key = create_random_key(length)
+        if key not in seen:
+            seen.add(key)
+            successes += 1
+    return successes / rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=200000, help="keys generated per throughput run")
+    parser.add_argument("--length", type=int, default=8)
+    parser.add_argument("--rows", type=int, default=10_000_000, help="table size for the success-rate estimate")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--simulate-length", type=int, default=4, help="key length for the collision simulation")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    key_space = len(RANDOM_ALPHABET) ** args.length
+    sim_space = len(RANDOM_ALPHABET) ** args.simulate_length
+    sim_rows = sim_space // 10
+    results = {
+        "throughput_keys_per_s": throughput(args.count, args.length),
+        "random_success_rate": random_success_rate(args.rows, key_space, args.retries),
+        "sequence_success_rate": 1.0,
+        "simulation": {
+            "rows": sim_rows,
+            "key_space": sim_space,
+            "observed_first_try": simulate_random(sim_rows, args.simulate_length),
+            "expected_first_try": random_success_rate(sim_rows, sim_space, 0)["first_try"],
+        },
+        "rows": args.rows,
+    }
+
+    for name, rate in results["throughput_keys_per_s"].items():
+        print(f"{name:>20}: {rate:>12,.0f} keys/s")
+    print(f"random keys at {args.rows:,} rows: {results['random_success_rate']}")
+    print(f"simulation: {results['simulation']}")
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Status listing benchmark.
+
+Seeds one account with `--links` links on the in-memory storage backend, then measures CPU and
+wall time per request of GET /v1/user/status returning the whole account, as one JSON page and
+as the NDJSON stream. Requests go straight to the ASGI app, so no socket or HTTP parsing is
+included; with no disk or network behind the database, serialization dominates what is left.
+
+    python -m benchmarks.listing_bench --links 100000
+"""
+import argparse
+import asyncio
+import json
+import os
+import secrets
+import time
+from typing import Dict
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--links", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default="listing_bench_results.json")
+    return parser.parse_args()
+
+
+def configure_environment(args: argparse.Namespace) -> None:
+    # Settings are read when `src` is first imported.
+    os.environ["STORAGE_BACKEND"] = "memory"
+    os.environ["STATUS_MAX_PAGE_SIZE"] = str(args.links)
+    os.environ.setdefault("BASE_URL", "http://bench/r")
+    os.environ.setdefault("APP_DEBUG_LEVEL", "WARNING")
+    # Background tasks would compete for the in-memory database's single connection.
+    os.environ.setdefault("KEY_FILTER_ENABLED", "false")
+    os.environ.setdefault("LINK_SWEEP_ENABLED", "false")
+
+
+async def seed(links: int) -> str:
+    from sqlalchemy import insert
+
+    from src.db import keygen
+    from src.db.db_connector import create_local_schema, engine
+    from src.models.models import URL, User
+
+    await create_local_schema()
+    token = secrets.token_urlsafe(32)
+    async with engine.begin() as conn:
+        user_id = (
+            await conn.execute(insert(User).values(username="bench_listing", token=token).returning(User.id))
+        ).scalar_one()
+        keys = keygen.create_random_keys(links, 10)
+        rows = [
+            {
+                "key": key,
+                "target_url": f"https://example.com/{key}",
+                "short_url": f"{os.environ['BASE_URL']}/{key}",
+                "is_active": True,
+                "user_id": user_id,
+                "type": "public",
+            }
+            for key in keys
+        ]
+        for start in range(0, len(rows), 5000):
+            await conn.execute(insert(URL), rows[start:start + 5000])
+    return token
+
+
+async def measure(client, spec, repeat: int) -> Dict[str, float]:
+    status, size = await client.request(spec)
+    assert status == 200, status
+    cpu, wall = time.process_time(), time.perf_counter()
+    for _ in range(repeat):
+        await client.request(spec)
+    return {
+        "cpu_ms": (time.process_time() - cpu) * 1000 / repeat,
+        "wall_ms": (time.perf_counter() - wall) * 1000 / repeat,
+        "bytes": size,
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    from benchmarks.http_bench import ASGIClient, RequestSpec
+    from src.main import app
+
+    token = await seed(args.links)
+    await app.router.startup()
+    client = ASGIClient(app)
+    headers = {"Authorization": f"Bearer {token}"}
+    results = {}
+    try:
+        for name, query in (("json", f"limit={args.links}"), ("ndjson", "format=ndjson")):
+            spec = RequestSpec(name, "GET", f"/v1/user/status?{query}", headers, b"", 200)
+            results[name] = await measure(client, spec, args.repeat)
+    finally:
+        await app.router.shutdown()
+    return results
+
+
+def main() -> None:
+    args = parse_args()
+    configure_environment(args)
+    results = asyncio.run(run(args))
+    with open(args.output, "w") as output:
+        json.dump({"links": args.links, "repeat": args.repeat, "results": results}, output, indent=2)
+
+    print(f"{'format':<10}{'cpu ms':>10}{'wall ms':>10}{'bytes':>12}")
+    for name, row in results.items():
+        print(f"{name:<10}{row['cpu_ms']:>10.1f}{row['wall_ms']:>10.1f}{row['bytes']:>12}")
+    print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Single-core comparison of GET /r/{key} served by the `RedirectFastPath` ASGI handler versus the
+regular FastAPI route (REDIRECT_FAST_PATH disabled).
+
+Seeds the same data set as `http_bench`, warms the redirect cache, then replays the same
+Zipf-distributed redirect workload in-process against both paths, alternating rounds so drift
+affects both equally. No sockets are involved, so the numbers isolate framework overhead.
+
+    python -m benchmarks.redirect_bench --redirects 20000 --rounds 3
+"""
+import argparse
+import asyncio
+import random
+
+from benchmarks.http_bench import ASGIClient, build_workloads, configure_environment, run_workload, seed
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="defaults to a SQLite file stand-in")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--links-per-user", type=int, default=100)
+    parser.add_argument("--private-share", type=float, default=0.1)
+    parser.add_argument("--zipf-s", type=float, default=1.1)
+    parser.add_argument("--redirects", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    # Fields `seed`/`build_workloads` expect but this benchmark does not exercise.
+    args.large_account_links, args.creates, args.status_calls, args.status_page_size = 0, 0, 0, 1
+    return args
+
+
+async def run(args: argparse.Namespace) -> dict:
+    rng = random.Random(args.seed)
+    data = await seed(args, rng)
+    redirects = build_workloads(args, rng, data)["redirect"]
+
+    from src.core.config import settings
+    from src.db.db_connector import engine
+    from src.main import app
+
+    await app.router.startup()
+    clients = [ASGIClient(app)] * args.concurrency
+    results = {"fast_path": [], "router": []}
+    try:
+        await run_workload(clients, redirects)
+        for _ in range(args.rounds):
+            for name, enabled in (("fast_path", True), ("router", False)):
+                settings.redirect_fast_path = enabled
+                results[name].append((await run_workload(clients, redirects))["redirect"])
+    finally:
+        settings.redirect_fast_path = True
+        await app.router.shutdown()
+        await engine.dispose()
+    return results
+
+
+def main() -> None:
+    args = parse_args()
+    configure_environment(args)
+    results = asyncio.run(run(args))
+
+    print(f"{'path':<12}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    best = {}
+    for name, rounds in results.items():
+        row = max(rounds, key=lambda item: item["throughput_rps"])
+        best[name] = row["throughput_rps"]
+        print(f"{name:<12}{row['throughput_rps']:>10.0f}{row['p50_ms']:>10.2f}{row['p99_ms']:>10.2f}{row['errors']:>8}")
+    print(f"speedup: {best['fast_path'] / best['router']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Bulk import and export benchmark.
+
+Measures rows per second of an upload of `--rows` links in three places:
+
+* parse: reading and validating the CSV and NDJSON lines alone, the part of an import that is the
+  same on every database. `plain` rows are ordinary https URLs; `fallback` rows (IP hosts) miss
+  the import's precompiled URL pattern and go through the API's own checks.
+* import: POST /v1/url/import end to end on the in-memory storage backend.
+* export: GET /v1/url/export of the imported links.
+
+Requests go straight to the ASGI app. The in-memory backend is SQLite, which loads chunks with an
+executemany INSERT rather than Postgres' COPY, so the import figure is a floor.
+
+    python -m benchmarks.transfer_bench --rows 200000
+"""
+import argparse
+import asyncio
+import json
+import os
+import secrets
+import time
+from typing import Dict, List
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--output", default="transfer_bench_results.json")
+    return parser.parse_args()
+
+
+def configure_environment(args: argparse.Namespace) -> None:
+    # Settings are read when `src` is first imported.
+    os.environ["STORAGE_BACKEND"] = "memory"
+    os.environ.setdefault("BASE_URL", "http://bench/r")
+    os.environ.setdefault("APP_DEBUG_LEVEL", "WARNING")
+    # Background tasks would compete for the in-memory database's single connection.
+    os.environ.setdefault("KEY_FILTER_ENABLED", "false")
+    os.environ.setdefault("LINK_SWEEP_ENABLED", "false")
+
+
+def upload_lines(rows: int, format: str, host: str) -> List[str]:
+    urls = (f"https://{host}/articles/{index}?utm_source=bench&page={index % 7}" for index in range(rows))
+    if format == "csv":
+        return ["target_url,type"] + [f"{url},public" for url in urls]
+    return [json.dumps({"target_url": url, "type": "public"}) for url in urls]
+
+
+def measure_parse(rows: int) -> Dict[str, float]:
+    from src.services.transfer_services import _RowParser
+
+    results = {}
+    for format in ("csv", "ndjson"):
+        for name, host in (("plain", "www.example.com"), ("fallback", "192.0.2.10")):
+            lines = upload_lines(rows, format, host)
+            parser = _RowParser(format)
+            started = time.perf_counter()
+            for line in lines:
+                parser.parse(line)
+            results[f"{format}_{name}"] = rows / (time.perf_counter() - started)
+    return results
+
+
+async def measure_http(client, token: str, rows: int) -> Dict[str, float]:
+    from benchmarks.http_bench import RequestSpec
+
+    headers = {"Authorization": f"Bearer {token}"}
+    body = "".join(f"{line}\n" for line in upload_lines(rows, "csv", "www.example.com")).encode()
+    results = {}
+
+    started = time.perf_counter()
+    status, _ = await client.request(RequestSpec("import", "POST", "/v1/url/import", headers, body, 200))
+    assert status == 200, status
+    results["import_csv"] = rows / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    status, _ = await client.request(RequestSpec("export", "GET", "/v1/url/export", headers, b"", 200))
+    assert status == 200, status
+    results["export_csv"] = rows / (time.perf_counter() - started)
+    return results
+
+
+async def run(args: argparse.Namespace) -> Dict[str, float]:
+    from sqlalchemy import insert
+
+    from benchmarks.http_bench import ASGIClient
+    from src.db.db_connector import create_local_schema, engine
+    from src.main import app
+    from src.models.models import User
+
+    await create_local_schema()
+    token = secrets.token_urlsafe(32)
+    async with engine.begin() as conn:
+        await conn.execute(insert(User).values(username="bench_transfer", token=token))
+
+    results = measure_parse(args.rows)
+    await app.router.startup()
+    try:
+        results.update(await measure_http(ASGIClient(app), token, args.rows))
+    finally:
+        await app.router.shutdown()
+    return results
+
+
+def main() -> None:
+    args = parse_args()
+    configure_environment(args)
+    results = asyncio.run(run(args))
+    with open(args.output, "w") as output:
+        json.dump({"rows": args.rows, "results": results}, output, indent=2)
+
+    print(f"{'stage':<18}{'rows/s':>12}")
+    for name, rate in results.items():
+        print(f"{name:<18}{rate:>12,.0f}")
+    print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
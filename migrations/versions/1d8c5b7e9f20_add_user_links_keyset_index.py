@@ -0,0 +1,27 @@
+"""Add partial (user_id, id) index for keyset pagination of active links
+
+Revision ID: 1d8c5b7e9f20
+Revises: e4b9f0a37c58
+Create Date: 2024-03-30 16:07:45.219853
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1d8c5b7e9f20'
+down_revision: Union[str, None] = 'e4b9f0a37c58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_url_shortener_urls_user_id_id_active', 'urls', ['user_id', 'id'], unique=False,
+                    schema='url_shortener', postgresql_where=sa.text('is_active'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_url_shortener_urls_user_id_id_active', table_name='urls', schema='url_shortener')
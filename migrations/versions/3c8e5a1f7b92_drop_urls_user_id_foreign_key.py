@@ -0,0 +1,27 @@
+"""Drop the urls.user_id foreign key so urls can be sharded away from users
+
+Revision ID: 3c8e5a1f7b92
+Revises: b6e2d94a1c37
+Create Date: 2024-04-16 10:21:54.307612
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c8e5a1f7b92'
+down_revision: Union[str, None] = 'b6e2d94a1c37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Shards run the same migrations but hold no users rows.
+    op.drop_constraint('urls_user_id_fkey', 'urls', schema='url_shortener', type_='foreignkey')
+
+
+def downgrade() -> None:
+    op.create_foreign_key('urls_user_id_fkey', 'urls', 'users', ['user_id'], ['id'],
+                          source_schema='url_shortener', referent_schema='url_shortener')
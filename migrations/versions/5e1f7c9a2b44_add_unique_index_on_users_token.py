@@ -0,0 +1,25 @@
+"""Add unique index on users.token
+
+Revision ID: 5e1f7c9a2b44
+Revises: 33b1b983d5a2
+Create Date: 2024-03-02 11:15:04.118302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e1f7c9a2b44'
+down_revision: Union[str, None] = '33b1b983d5a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_url_shortener_users_token'), 'users', ['token'], unique=True, schema='url_shortener')
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_url_shortener_users_token'), table_name='users', schema='url_shortener')
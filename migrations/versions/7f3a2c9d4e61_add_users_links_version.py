@@ -0,0 +1,27 @@
+"""Add users.links_version for conditional GET on the status listing
+
+Revision ID: 7f3a2c9d4e61
+Revises: 1d8c5b7e9f20
+Create Date: 2024-04-02 11:24:13.508217
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7f3a2c9d4e61'
+down_revision: Union[str, None] = '1d8c5b7e9f20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('links_version', sa.Integer(), server_default='0', nullable=False),
+                  schema='url_shortener')
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'links_version', schema='url_shortener')
@@ -0,0 +1,36 @@
+"""Add urls.target_digest and index it with user and type instead of indexing target_url
+
+Revision ID: 8d2f6b4e1a95
+Revises: 3c8e5a1f7b92
+Create Date: 2024-04-23 11:48:05.519820
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2f6b4e1a95'
+down_revision: Union[str, None] = '3c8e5a1f7b92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('urls', sa.Column('target_digest', sa.LargeBinary(length=16), nullable=True),
+                  schema='url_shortener')
+    # Same digest as url_services.target_digest computes for new rows.
+    op.execute("UPDATE url_shortener.urls SET target_digest = decode(md5(target_url), 'hex') "
+               "WHERE target_url IS NOT NULL")
+    op.drop_index('ix_url_shortener_urls_target_url', table_name='urls', schema='url_shortener')
+    op.create_index('ix_url_shortener_urls_user_id_type_target_digest', 'urls', ['user_id', 'type', 'target_digest'],
+                    unique=False, schema='url_shortener', postgresql_where=sa.text('is_active'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_url_shortener_urls_user_id_type_target_digest', table_name='urls', schema='url_shortener')
+    op.create_index('ix_url_shortener_urls_target_url', 'urls', ['target_url'], unique=False, schema='url_shortener',
+                    postgresql_where=sa.text('is_active'))
+    op.drop_column('urls', 'target_digest', schema='url_shortener')
@@ -0,0 +1,37 @@
+"""Create clicks table
+
+Revision ID: 9a4d6e2f8c13
+Revises: 5e1f7c9a2b44
+Create Date: 2024-03-09 14:02:37.520914
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4d6e2f8c13'
+down_revision: Union[str, None] = '5e1f7c9a2b44'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('clicks',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('key', sa.String(), nullable=True),
+    sa.Column('clicked_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('user_agent', sa.String(), nullable=True),
+    sa.Column('referrer', sa.String(), nullable=True),
+    sa.Column('ip_hash', sa.String(length=32), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    schema='url_shortener'
+    )
+    op.create_index(op.f('ix_url_shortener_clicks_key'), 'clicks', ['key'], unique=False, schema='url_shortener')
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_url_shortener_clicks_key'), table_name='clicks', schema='url_shortener')
+    op.drop_table('clicks', schema='url_shortener')
@@ -0,0 +1,61 @@
+"""Make the urls key index unique over all rows and keep archived keys out of urls
+
+Revision ID: a7d3c5e91f48
+Revises: f2a8c4d61b93
+Create Date: 2024-05-16 11:47:03.215904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d3c5e91f48'
+down_revision: Union[str, None] = 'f2a8c4d61b93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Unique only among live links, a deactivated link's key could be issued again, mixing the old
+    # link's clicks and rollups into the new one's. Fails if that has already happened.
+    op.drop_index('ix_url_shortener_urls_key_inactive', table_name='urls', schema='url_shortener')
+    op.drop_index('ix_url_shortener_urls_key', table_name='urls', schema='url_shortener')
+    op.create_index('ix_url_shortener_urls_key', 'urls', ['key'], unique=True, schema='url_shortener')
+    op.create_index('ix_url_shortener_urls_key_active', 'urls', ['key'], unique=False, schema='url_shortener',
+                    postgresql_where=sa.text('is_active'))
+
+    # Archived links have left urls, so the index no longer covers their keys; inserting one is
+    # skipped instead, which callers already treat as a taken key and retry (see models.URLArchive).
+    op.create_index('ix_url_shortener_urls_archive_key', 'urls_archive', ['key'], unique=False,
+                    schema='url_shortener')
+    op.execute(
+        """
+        CREATE FUNCTION url_shortener.skip_archived_key() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF EXISTS (SELECT 1 FROM url_shortener.urls_archive WHERE key = NEW.key) THEN
+                RETURN NULL;
+            END IF;
+            RETURN NEW;
+        END
+        $$
+        """
+    )
+    op.execute(
+        "CREATE TRIGGER urls_skip_archived_key BEFORE INSERT ON url_shortener.urls "
+        "FOR EACH ROW EXECUTE FUNCTION url_shortener.skip_archived_key()"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER urls_skip_archived_key ON url_shortener.urls")
+    op.execute("DROP FUNCTION url_shortener.skip_archived_key()")
+    op.drop_index('ix_url_shortener_urls_archive_key', table_name='urls_archive', schema='url_shortener')
+    op.drop_index('ix_url_shortener_urls_key_active', table_name='urls', schema='url_shortener')
+    op.drop_index('ix_url_shortener_urls_key', table_name='urls', schema='url_shortener')
+    op.create_index('ix_url_shortener_urls_key', 'urls', ['key'], unique=True, schema='url_shortener',
+                    postgresql_where=sa.text('is_active'))
+    op.create_index('ix_url_shortener_urls_key_inactive', 'urls', ['key'], unique=False, schema='url_shortener',
+                    postgresql_where=sa.text('NOT is_active'))
@@ -0,0 +1,69 @@
+"""Add link expiry, the urls archive table and partial indexes on is_active
+
+Revision ID: b6e2d94a1c37
+Revises: 7f3a2c9d4e61
+Create Date: 2024-04-09 15:02:37.841196
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6e2d94a1c37'
+down_revision: Union[str, None] = '7f3a2c9d4e61'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('urls', sa.Column('expires_at', sa.DateTime(timezone=True), nullable=True), schema='url_shortener')
+    op.add_column('urls', sa.Column('deactivated_at', sa.DateTime(timezone=True), nullable=True),
+                  schema='url_shortener')
+
+    # Deactivated rows no longer need to be in these indexes; lookups filter on is_active.
+    op.drop_index('ix_url_shortener_urls_key', table_name='urls', schema='url_shortener')
+    op.drop_index('ix_url_shortener_urls_short_url', table_name='urls', schema='url_shortener')
+    op.drop_index('ix_url_shortener_urls_target_url', table_name='urls', schema='url_shortener')
+    op.create_index('ix_url_shortener_urls_key', 'urls', ['key'], unique=True, schema='url_shortener',
+                    postgresql_where=sa.text('is_active'))
+    op.create_index('ix_url_shortener_urls_short_url', 'urls', ['short_url'], unique=False, schema='url_shortener',
+                    postgresql_where=sa.text('is_active'))
+    op.create_index('ix_url_shortener_urls_target_url', 'urls', ['target_url'], unique=False, schema='url_shortener',
+                    postgresql_where=sa.text('is_active'))
+    op.create_index('ix_url_shortener_urls_expires_at_active', 'urls', ['expires_at'], unique=False,
+                    schema='url_shortener', postgresql_where=sa.text('is_active AND expires_at IS NOT NULL'))
+    op.create_index('ix_url_shortener_urls_deactivated_at_inactive', 'urls', ['deactivated_at'], unique=False,
+                    schema='url_shortener', postgresql_where=sa.text('NOT is_active'))
+
+    op.create_table('urls_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('key', sa.String(), nullable=True),
+    sa.Column('target_url', sa.String(), nullable=True),
+    sa.Column('short_url', sa.String(), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('type', postgresql.ENUM('public', 'private', name='url_type', create_type=False), nullable=True),
+    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('deactivated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('archived_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    schema='url_shortener'
+    )
+
+
+def downgrade() -> None:
+    # Fails if a key of an archived or deactivated link has been reissued since the upgrade.
+    op.drop_table('urls_archive', schema='url_shortener')
+    op.drop_index('ix_url_shortener_urls_deactivated_at_inactive', table_name='urls', schema='url_shortener')
+    op.drop_index('ix_url_shortener_urls_expires_at_active', table_name='urls', schema='url_shortener')
+    op.drop_index('ix_url_shortener_urls_target_url', table_name='urls', schema='url_shortener')
+    op.drop_index('ix_url_shortener_urls_short_url', table_name='urls', schema='url_shortener')
+    op.drop_index('ix_url_shortener_urls_key', table_name='urls', schema='url_shortener')
+    op.create_index('ix_url_shortener_urls_target_url', 'urls', ['target_url'], unique=False, schema='url_shortener')
+    op.create_index('ix_url_shortener_urls_short_url', 'urls', ['short_url'], unique=False, schema='url_shortener')
+    op.create_index('ix_url_shortener_urls_key', 'urls', ['key'], unique=True, schema='url_shortener')
+    op.drop_column('urls', 'deactivated_at', schema='url_shortener')
+    op.drop_column('urls', 'expires_at', schema='url_shortener')
@@ -0,0 +1,48 @@
+"""Create click rollup tables
+
+Revision ID: c27b81e5d0f6
+Revises: 9a4d6e2f8c13
+Create Date: 2024-03-16 10:48:22.307145
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c27b81e5d0f6'
+down_revision: Union[str, None] = '9a4d6e2f8c13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('click_rollups_hourly',
+    sa.Column('key', sa.String(), nullable=False),
+    sa.Column('bucket', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('clicks', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('key', 'bucket'),
+    schema='url_shortener'
+    )
+    op.create_table('click_rollups_daily',
+    sa.Column('key', sa.String(), nullable=False),
+    sa.Column('bucket', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('clicks', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('key', 'bucket'),
+    schema='url_shortener'
+    )
+    op.create_table('referrer_rollups',
+    sa.Column('key', sa.String(), nullable=False),
+    sa.Column('referrer', sa.String(), nullable=False),
+    sa.Column('clicks', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('key', 'referrer'),
+    schema='url_shortener'
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('referrer_rollups', schema='url_shortener')
+    op.drop_table('click_rollups_daily', schema='url_shortener')
+    op.drop_table('click_rollups_hourly', schema='url_shortener')
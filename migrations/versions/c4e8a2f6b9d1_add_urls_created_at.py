@@ -0,0 +1,31 @@
+"""Add urls.created_at for polling new links
+
+Revision ID: c4e8a2f6b9d1
+Revises: a7d3c5e91f48
+Create Date: 2024-05-21 09:13:52.604117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e8a2f6b9d1'
+down_revision: Union[str, None] = 'a7d3c5e91f48'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing rows keep NULL; the key filter and redirect snapshot load them on their full rebuilds.
+    op.add_column('urls', sa.Column('created_at', sa.DateTime(timezone=True), nullable=True), schema='url_shortener')
+    op.alter_column('urls', 'created_at', server_default=sa.text('now()'), schema='url_shortener')
+    op.create_index('ix_url_shortener_urls_created_at_active', 'urls', ['created_at'], unique=False,
+                    schema='url_shortener', postgresql_where=sa.text('is_active'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_url_shortener_urls_created_at_active', table_name='urls', schema='url_shortener')
+    op.drop_column('urls', 'created_at', schema='url_shortener')
@@ -0,0 +1,31 @@
+"""Create url key sequence
+
+Revision ID: e4b9f0a37c58
+Revises: c27b81e5d0f6
+Create Date: 2024-03-23 09:31:12.884620
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b9f0a37c58'
+down_revision: Union[str, None] = 'c27b81e5d0f6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Each nextval() leases a block of this many ids to one worker (see src/db/keygen.py).
+KEY_BLOCK_SIZE = 1000
+
+
+def upgrade() -> None:
+    op.execute(sa.schema.CreateSequence(
+        sa.Sequence('url_key_seq', start=1, increment=KEY_BLOCK_SIZE, schema='url_shortener')
+    ))
+
+
+def downgrade() -> None:
+    op.execute(sa.schema.DropSequence(sa.Sequence('url_key_seq', schema='url_shortener')))
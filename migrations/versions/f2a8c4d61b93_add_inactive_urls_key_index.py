@@ -0,0 +1,27 @@
+"""Index the keys of deactivated urls
+
+Revision ID: f2a8c4d61b93
+Revises: 8d2f6b4e1a95
+Create Date: 2024-05-02 10:21:37.402518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a8c4d61b93'
+down_revision: Union[str, None] = '8d2f6b4e1a95'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_url_shortener_urls_key_inactive', 'urls', ['key'], unique=False, schema='url_shortener',
+                    postgresql_where=sa.text('NOT is_active'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_url_shortener_urls_key_inactive', table_name='urls', schema='url_shortener')
@@ -0,0 +1,93 @@
+import json
+from typing import Dict, List, Optional, Tuple
+
+from src.services.redirect_services import RedirectResult, bearer_token, record_click, resolve_redirect
+from src.core.config import settings
+
+REDIRECT_PREFIX = "/r/"
+REDIRECT_ROUTE = "/r/{key}"
+# The request headers a redirect reads; ASGI hands them over lower-cased.
+REQUEST_HEADERS = (b"authorization", b"user-agent", b"referer", b"if-none-match")
+
+
+class RedirectFastPath:
+    """
+    Lean ASGI handler for GET /r/{key}, mounted ahead of the FastAPI router so redirects skip
+    routing, dependency injection and exception handling. Status codes, bodies and headers match
+    `url_routes.redirect_to_url`; both go through `resolve_redirect`. Anything that is not a GET
+    for a single path segment under /r/ is passed through to the app untouched.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        key = _redirect_key(scope)
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+
+        scope["metrics_route"] = REDIRECT_ROUTE
+        headers = _request_headers(scope)
+        result = await resolve_redirect(key, bearer_token(headers[b"authorization"]), headers[b"if-none-match"])
+        if result.detail is not None:
+            await _send(send, result.status_code, _json_headers(result.detail), _json_body(result.detail))
+            return
+
+        client = scope.get("client")
+        client_ip = client[0] if client else None
+        record_click(key, user_agent=headers[b"user-agent"], referrer=headers[b"referer"], client_ip=client_ip)
+        await _send(send, result.status_code, _redirect_headers(result), b"")
+
+
+def _redirect_key(scope) -> Optional[str]:
+    """
+    The short key of a GET for a single path segment under /r/, or None for anything else.
+    """
+    if (
+        not settings.redirect_fast_path
+        or scope["type"] != "http"
+        or scope["method"] != "GET"
+        or not scope["path"].startswith(REDIRECT_PREFIX)
+    ):
+        return None
+    key = scope["path"][len(REDIRECT_PREFIX):]
+    return key if key and "/" not in key else None
+
+
+def _request_headers(scope) -> Dict[bytes, Optional[str]]:
+    headers: Dict[bytes, Optional[str]] = dict.fromkeys(REQUEST_HEADERS)
+    for name, value in scope["headers"]:
+        if name in headers:
+            headers[name] = value.decode("latin-1")
+    return headers
+
+
+def _redirect_headers(result: RedirectResult) -> List[Tuple[bytes, bytes]]:
+    headers = [
+        (b"location", result.location.encode("latin-1")),
+        (b"x-cache", result.cache_status.encode("latin-1")),
+        (b"cache-control", result.cache_control.encode("latin-1")),
+    ]
+    if result.etag is not None:
+        headers.append((b"etag", result.etag.encode("latin-1")))
+    if result.status_code != 304:
+        headers.append((b"content-length", b"0"))
+    return headers
+
+
+def _json_body(detail: Optional[str]) -> bytes:
+    # Same encoding as FastAPI's HTTPException handler.
+    return json.dumps({"detail": detail}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _json_headers(detail: Optional[str]) -> List[Tuple[bytes, bytes]]:
+    return [
+        (b"content-length", str(len(_json_body(detail))).encode("latin-1")),
+        (b"content-type", b"application/json"),
+    ]
+
+
+async def _send(send, status_code: int, headers: List[Tuple[bytes, bytes]], body: bytes) -> None:
+    await send({"type": "http.response.start", "status": status_code, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
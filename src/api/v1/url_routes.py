@@ -1,17 +1,42 @@
 import logging.config
-from typing import Optional, List
+from typing import Any, List, Optional, Tuple
 
+import orjson
 import validators
-from fastapi import APIRouter, Depends, HTTPException, status, Header, Request, Response
+from fastapi import APIRouter, Body, Depends, HTTPException, status, Header, Query, Request, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.exc import SQLAlchemyError, OperationalError, TimeoutError, DatabaseError
 
 
-from src.services.url_services import create_db_url, fetch_user_links, get_db_url_by_key, deactivate_db_url_by_key
-from src.db.db_connector import get_async_session
-from src.models.models import User
-from src.models.schemas import URLBase, LinkResponse, URLResponse
+from src.services.url_services import (
+    create_db_url,
+    create_db_urls_bulk,
+    find_db_url_by_target,
+    fetch_user_links,
+    stream_user_links,
+    get_cached_redirect,
+    load_redirect_by_key,
+    deactivate_db_url_by_key,
+)
+from src.services.click_services import fetch_url_stats
+from src.services.transfer_services import MEDIA_TYPES, export_links, import_links
+from src.services.redirect_services import bearer_token, record_click, resolve_redirect
+from src.services.user_services import CachedUser, get_links_version, get_user_by_token as fetch_user_by_token
+from src.db.db_connector import get_async_session, get_read_session, remember_write
+from src.models.schemas import (
+    URLBase,
+    LinkResponse,
+    URLResponse,
+    BatchURLResponse,
+    ImportResponse,
+    StatsGranularity,
+    URLStatsResponse,
+)
+from src.core.config import settings
+from src.core.http_cache import etag_matches, make_etag
 from src.core.logger import LOGGING
 
 
@@ -19,14 +44,14 @@ logging.config.dictConfig(LOGGING)
 logger = logging.getLogger(__name__)
 
 
+# The hot endpoints below return ORJSONResponse themselves, which skips response_model validation and
+# the stdlib encoder; response_model still documents their shape.
 router = APIRouter()
 
 
-async def get_user_by_token(db: AsyncSession, token: str) -> Optional[User]:
+async def get_user_by_token(db: AsyncSession, token: str) -> Optional[CachedUser]:
     try:
-        result = await db.execute(select(User).filter(User.token == token))
-        user = result.scalars().first()
-        return user
+        return await fetch_user_by_token(db, token)
     except SQLAlchemyError:
         raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Database error occurred")
 
@@ -58,8 +83,15 @@ async def ping_database(db: AsyncSession = Depends(get_async_session)):
 
 @router.post("/v1/url", response_model=URLResponse, status_code=status.HTTP_201_CREATED)
 async def create_url(
-    url: URLBase, db: AsyncSession = Depends(get_async_session), token: str = Depends(token_dependency)
+    url: URLBase,
+    idempotent: bool = Query(False),
+    db: AsyncSession = Depends(get_async_session),
+    token: str = Depends(token_dependency),
 ):
+    """
+    With `idempotent=true`, a live link of the caller's to the same target and type is returned
+    with 200 instead of creating another one, so retried requests do not pile up duplicates.
+    """
     if not validators.url(url.target_url):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid URL provided")
 
@@ -68,11 +100,139 @@ async def create_url(
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized or user not found")
 
     try:
-        db_url = await create_db_url(db=db, url=url, user_id=user.id)
+        db_url = await find_db_url_by_target(db=db, url=url, user_id=user.id) if idempotent else None
+        status_code = status.HTTP_200_OK if db_url is not None else status.HTTP_201_CREATED
+        if db_url is None:
+            db_url = await create_db_url(db=db, url=url, user_id=user.id)
     except SQLAlchemyError:
         raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Failed to create URL")
 
-    return {"key": db_url.key, "short_url": db_url.short_url, "target_url": db_url.target_url}
+    remember_write(token=token)
+    return ORJSONResponse(
+        {
+            "key": db_url.key,
+            "short_url": db_url.short_url,
+            "target_url": db_url.target_url,
+            "expires_at": db_url.expires_at,
+        },
+        status_code=status_code,
+    )
+
+
+def _parse_batch_item(raw: Any) -> Tuple[Optional[URLBase], Optional[str]]:
+    """
+    Validate one batch item on its own, so that a bad item fails alone instead of the whole batch.
+    Returns the parsed item or the reason it was rejected.
+    """
+    try:
+        url = URLBase.parse_obj(raw)
+    except ValidationError as e:
+        return None, "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors())
+    if not validators.url(url.target_url):
+        return None, "Invalid URL provided"
+    return url, None
+
+
+# Items are validated one by one in the route; the schema still documents what each item should be.
+BATCH_REQUEST_SCHEMA = {"type": "array", "items": {"$ref": "#/components/schemas/URLBase"}}
+
+
+@router.post(
+    "/v1/url/batch",
+    response_model=BatchURLResponse,
+    openapi_extra={"requestBody": {"content": {"application/json": {"schema": BATCH_REQUEST_SCHEMA}}}},
+)
+async def create_urls_batch(
+    urls: List[Any] = Body(...),
+    db: AsyncSession = Depends(get_async_session),
+    token: str = Depends(token_dependency),
+):
+    """
+    Create a link for every item; items are validated one by one and the response reports each
+    item's key or error by its position in the request.
+    """
+    if len(urls) > settings.batch_max_items:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Batch is limited to {settings.batch_max_items} items",
+        )
+
+    user = await get_user_by_token(db, token)
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized or user not found")
+
+    items, valid = [], []
+    for index, raw in enumerate(urls):
+        url, error = _parse_batch_item(raw)
+        target_url = raw.get("target_url") if isinstance(raw, dict) else None
+        items.append(
+            {
+                "index": index,
+                "ok": False,
+                "target_url": "" if target_url is None else str(target_url),
+                "key": None,
+                "short_url": None,
+                "error": error,
+            }
+        )
+        if url is not None:
+            valid.append((index, url))
+
+    try:
+        keys = await create_db_urls_bulk(db=db, urls=[url for _, url in valid], user_id=user.id)
+    except SQLAlchemyError:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Failed to create URLs")
+    remember_write(token=token)
+
+    for (index, _), key in zip(valid, keys):
+        if key is None:
+            items[index]["error"] = "Could not allocate a unique key"
+            continue
+        items[index].update(ok=True, key=key, short_url=f"{settings.base_url}/{key}")
+
+    created = sum(1 for item in items if item["ok"])
+    return ORJSONResponse({"created": created, "failed": len(items) - created, "items": items})
+
+
+@router.post("/v1/url/import", response_model=ImportResponse)
+async def import_urls(
+    request: Request,
+    format: str = Query("csv", regex="^(csv|ndjson)$"),
+    db: AsyncSession = Depends(get_async_session),
+    token: str = Depends(token_dependency),
+):
+    """
+    Import links from a CSV (header row with a `target_url` and optional `type` column) or NDJSON
+    request body. The body is read and loaded in chunks as it arrives; each chunk is committed, so
+    if the import fails part way the rows before it stay imported.
+    """
+    user = await get_user_by_token(db, token)
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized or user not found")
+
+    try:
+        report = await import_links(db, request.stream(), format, user.id)
+    except SQLAlchemyError:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Failed to import URLs")
+    remember_write(token=token)
+    return report
+
+
+@router.get("/v1/url/export")
+async def export_urls(
+    format: str = Query("csv", regex="^(csv|ndjson)$"),
+    db: AsyncSession = Depends(get_read_session),
+    token: str = Depends(token_dependency),
+):
+    """
+    Stream all of the user's active links as CSV or NDJSON from a server-side cursor.
+    """
+    user = await get_user_by_token(db, token)
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized or user not found")
+
+    headers = {"Content-Disposition": f'attachment; filename="links.{format}"'}
+    return StreamingResponse(export_links(db, format, user.id), media_type=MEDIA_TYPES[format], headers=headers)
 
 
 @router.delete("/v1/url/{key}")
@@ -89,39 +249,102 @@ async def delete_url(key: str, db: AsyncSession = Depends(get_async_session), to
     if not deactivation_result:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="URL not found or unauthorized to delete")
 
+    remember_write(token=token, key=key)
+
     return {"message": "URL successfully deactivated"}
 
 
-@router.get("/v1/user/status", response_model=List[LinkResponse])
-async def get_user_links(db: AsyncSession = Depends(get_async_session), token: str = Depends(token_dependency)):
+@router.get("/v1/url/{key}/stats", response_model=URLStatsResponse)
+async def get_url_stats(
+    key: str,
+    granularity: StatsGranularity = StatsGranularity.day,
+    limit: int = Query(30, ge=1, le=1000),
+    top_referrers: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_session),
+    token: str = Depends(token_dependency),
+):
     user = await get_user_by_token(db, token)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized or user not found")
 
     try:
-        links = await fetch_user_links(db, user.id)
+        url = get_cached_redirect(key) or await load_redirect_by_key(db, key)
+        if not url or url.user_id != user.id:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="URL not found")
+        stats = await fetch_url_stats(db, key, granularity, limit, top_referrers)
     except SQLAlchemyError:
-        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Failed to fetch user links")
-
-    return links
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Failed to fetch URL stats")
 
+    return stats
 
-@router.get("/r/{key}")
-async def redirect_to_url(request: Request, key: str, db: AsyncSession = Depends(get_async_session)):
-    url = await get_db_url_by_key(db, key)
 
-    if not url:
-        raise HTTPException(status_code=404, detail="URL not found")
-
-    authorization: str = request.headers.get("Authorization")
-    token = authorization.split(" ")[1] if authorization and authorization.startswith("Bearer ") else None
+@router.get("/v1/user/status", response_model=List[LinkResponse])
+async def get_user_links(
+    limit: int = Query(settings.status_page_size, ge=1, le=settings.status_max_page_size),
+    cursor: Optional[int] = Query(None, ge=0),
+    format: str = Query("json", regex="^(json|ndjson)$"),
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_read_session),
+    token: str = Depends(token_dependency),
+):
+    """
+    List the user's active links, `limit` at a time. The cursor for the next page is returned in the
+    `X-Next-Cursor` header. With `format=ndjson` every link from `cursor` on is streamed, one per line.
+    The ETag follows the user's links_version, so a poll with a matching If-None-Match gets a 304
+    without the links being read.
+    """
+    user = await get_user_by_token(db, token)
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized or user not found")
 
-    if url.type == "private":
-        if not token:
-            raise HTTPException(status_code=401, detail="Authorization required for private URLs")
+    try:
+        # Read before the links, so a concurrent write can only make the ETag older than the body.
+        version = await get_links_version(db, user.id)
+    except SQLAlchemyError:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Failed to fetch user links")
+    etag = make_etag(user.id, version, format, limit, cursor, weak=True)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    if format == "ndjson":
+        lines = (
+            b"".join([orjson.dumps(link) + b"\n" for link in links])
+            async for links in stream_user_links(db, user.id, cursor)
+        )
+        return StreamingResponse(lines, media_type="application/x-ndjson", headers=headers)
 
-        user = await get_user_by_token(db, token)
-        if not user or user.id != url.user_id:
-            raise HTTPException(status_code=403, detail="Not authorized to access this URL")
+    try:
+        links, next_cursor = await fetch_user_links(db, user.id, limit, cursor)
+    except SQLAlchemyError:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Failed to fetch user links")
 
-    return Response(status_code=307, headers={"Location": url.target_url})
+    if next_cursor is not None:
+        headers["X-Next-Cursor"] = str(next_cursor)
+        headers["Link"] = f'</v1/user/status?limit={limit}&cursor={next_cursor}>; rel="next"'
+    return ORJSONResponse(links, headers=headers)
+
+
+@router.get("/r/{key}", status_code=status.HTTP_307_TEMPORARY_REDIRECT)
+async def redirect_to_url(request: Request, key: str):
+    """
+    Redirect to the link's target. In the running app this path is served by the
+    `RedirectFastPath` ASGI handler ahead of the router; this route documents it and serves
+    it when REDIRECT_FAST_PATH is disabled. Both share `resolve_redirect`.
+    """
+    result = await resolve_redirect(
+        key, bearer_token(request.headers.get("Authorization")), request.headers.get("If-None-Match")
+    )
+    if result.detail is not None:
+        raise HTTPException(status_code=result.status_code, detail=result.detail)
+
+    record_click(
+        key,
+        user_agent=request.headers.get("User-Agent"),
+        referrer=request.headers.get("Referer"),
+        client_ip=request.client.host if request.client else None,
+    )
+    headers = {"Location": result.location, "X-Cache": result.cache_status, "Cache-Control": result.cache_control}
+    if result.etag is not None:
+        headers["ETag"] = result.etag
+    return Response(status_code=result.status_code, headers=headers)
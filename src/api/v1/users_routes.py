@@ -2,6 +2,8 @@ import secrets
 from typing import Any
 
 from fastapi import APIRouter, Depends, HTTPException, status, Body
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 
@@ -18,11 +20,13 @@ async def register_user(*, db: AsyncSession = Depends(get_async_session), userna
     Register a new user with a given username.
     """
     token = secrets.token_urlsafe(32)
-    new_user = User(username=username, token=token)
-    db.add(new_user)
     try:
+        new_user = (
+            await db.execute(insert(User).values(username=username, token=token, is_active=True).returning(User))
+        ).scalar_one()
         await db.commit()
-        await db.refresh(new_user)
-        return new_user
+        body = {"id": new_user.id, "username": new_user.username, "token": token, "is_active": new_user.is_active}
+        return ORJSONResponse(body, status_code=status.HTTP_201_CREATED)
     except IntegrityError:
+        await db.rollback()
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Username is already taken")
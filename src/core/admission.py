@@ -0,0 +1,170 @@
+import asyncio
+import json
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from src.core.config import settings
+from src.core.metrics import CallbackMetric, registry
+
+
+class ConcurrencyLimit:
+    """
+    At most `limit` requests in flight, at most `queue_size` more waiting (each for up to
+    `queue_timeout` seconds); anything beyond that is turned away at once. A released slot is
+    handed straight to the oldest waiter, so waiters are served in arrival order.
+    """
+
+    def __init__(self, name: str, limit: int, queue_size: int, queue_timeout: float) -> None:
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> bool:
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return True
+        if len(self._waiters) >= self.queue_size:
+            self.rejected += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            return False
+        except asyncio.CancelledError:
+            # The client went away after the slot was handed over; pass it on.
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if not waiter.done() or waiter.cancelled():
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+        self.admitted += 1
+        return True
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+def _limit(name: str, limit: int, queue_size: int) -> ConcurrencyLimit:
+    return ConcurrencyLimit(name, limit, queue_size, settings.admission_queue_timeout)
+
+
+# Redirects get by far the largest budget; the management classes are capped well below the
+# connection pool so that they can never take all of it.
+limits: Dict[str, ConcurrencyLimit] = {
+    "redirect": _limit("redirect", settings.admission_redirect_limit, settings.admission_redirect_queue),
+    "write": _limit("write", settings.admission_write_limit, settings.admission_write_queue),
+    "listing": _limit("listing", settings.admission_listing_limit, settings.admission_listing_queue),
+    "registration": _limit(
+        "registration", settings.admission_registration_limit, settings.admission_registration_queue
+    ),
+    "health": _limit("health", settings.admission_health_limit, settings.admission_health_queue),
+}
+
+
+def route_class(method: str, path: str) -> Optional[str]:
+    if path.startswith("/r/"):
+        return "redirect"
+    if path == "/v1/ping":
+        return "health"
+    if path == "/v1/user/registration":
+        return "registration"
+    if path in ("/v1/user/status", "/v1/url/export") or (path.startswith("/v1/url/") and path.endswith("/stats")):
+        return "listing"
+    if path.startswith("/v1/url") and method in ("POST", "DELETE"):
+        return "write"
+    return None
+
+
+registry.register(
+    CallbackMetric(
+        "admission_requests",
+        "Requests in flight and waiting per admission class.",
+        lambda: [
+            sample
+            for name, limit in limits.items()
+            for sample in (((name, "active"), limit.active), ((name, "queued"), limit.queued))
+        ],
+        ["class", "state"],
+    )
+)
+registry.register(
+    CallbackMetric(
+        "admission_decisions_total",
+        "Admission decisions per class: admitted, rejected with a full queue, or timed out waiting.",
+        lambda: [
+            sample
+            for name, limit in limits.items()
+            for sample in (
+                ((name, "admitted"), limit.admitted),
+                ((name, "rejected"), limit.rejected),
+                ((name, "timed_out"), limit.timed_out),
+            )
+        ],
+        ["class", "outcome"],
+        "counter",
+    )
+)
+
+
+class AdmissionControlMiddleware:
+    """
+    Pure ASGI middleware that holds each request to its route class's concurrency budget and
+    answers 503 with Retry-After when the budget and its wait queue are exhausted, instead of
+    letting requests pile up on the connection pool. The slot is held until the response,
+    including a streamed one, is complete.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        limit = None
+        if scope["type"] == "http" and settings.admission_enabled:
+            name = route_class(scope["method"], scope["path"])
+            limit = limits.get(name) if name else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not await limit.acquire():
+            await _send_busy(send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limit.release()
+
+
+async def _send_busy(send) -> None:
+    body = json.dumps({"detail": "Server is busy, retry later"}).encode()
+    headers = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode()),
+        (b"retry-after", str(settings.admission_retry_after).encode()),
+    ]
+    await send({"type": "http.response.start", "status": 503, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
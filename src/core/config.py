@@ -11,10 +11,89 @@ ENV_FILE_PATH = os.path.join(BASE_DIR, env_file)
 
 class Settings(BaseSettings):
     app_debug_level: str = Field("INFO", env="APP_DEBUG_LEVEL")
+    log_format: str = Field("text", env="LOG_FORMAT")
+    log_file: str = Field("app.log", env="LOG_FILE")
+    hot_path_log_rate: float = Field(10.0, env="HOT_PATH_LOG_RATE")
+    hot_path_log_burst: int = Field(50, env="HOT_PATH_LOG_BURST")
+    db_echo: bool = Field(False, env="DB_ECHO")
     base_dir: str = Field(BASE_DIR)
     env_name: str = os.getenv("ENV_NAME")
     base_url: str = os.getenv("BASE_URL")
     db_url: str = os.getenv("DATABASE_URL")
+    storage_backend: str = Field("postgres", env="STORAGE_BACKEND")
+    sqlite_path: str = Field("url_shortener.sqlite3", env="SQLITE_PATH")
+    db_pool_size: int = Field(5, env="DB_POOL_SIZE")
+    db_max_overflow: int = Field(10, env="DB_MAX_OVERFLOW")
+    db_pool_recycle: int = Field(-1, env="DB_POOL_RECYCLE")
+    db_pool_pre_ping: bool = Field(False, env="DB_POOL_PRE_PING")
+    db_pool_warm_connections: int = Field(5, env="DB_POOL_WARM_CONNECTIONS")
+    db_replica_urls: str = Field("", env="DATABASE_REPLICA_URLS")
+    db_replica_selection: str = Field("round_robin", env="DB_REPLICA_SELECTION")
+    read_your_writes_window: float = Field(5.0, env="READ_YOUR_WRITES_WINDOW")
+    db_shard_urls: str = Field("", env="DATABASE_SHARD_URLS")
+    db_shard_policy: str = Field("round_robin", env="DB_SHARD_POLICY")
+    redirect_cache_size: int = Field(10000, env="REDIRECT_CACHE_SIZE")
+    # Per worker: a link deleted through another worker keeps redirecting here for up to this long,
+    # unless the shared redirect snapshot (which every worker reads) is enabled and holds the key.
+    redirect_cache_ttl: float = Field(60.0, env="REDIRECT_CACHE_TTL")
+    redirect_fast_path: bool = Field(True, env="REDIRECT_FAST_PATH")
+    public_redirect_status: int = Field(307, env="PUBLIC_REDIRECT_STATUS")
+    public_redirect_max_age: int = Field(0, env="PUBLIC_REDIRECT_MAX_AGE")
+    redirect_snapshot_enabled: bool = Field(False, env="REDIRECT_SNAPSHOT_ENABLED")
+    redirect_snapshot_path: str = Field("/dev/shm/url_shortener_redirects", env="REDIRECT_SNAPSHOT_PATH")
+    redirect_snapshot_capacity: int = Field(1000000, env="REDIRECT_SNAPSHOT_CAPACITY")
+    redirect_snapshot_refresh_interval: float = Field(1.0, env="REDIRECT_SNAPSHOT_REFRESH_INTERVAL")
+    redirect_snapshot_rebuild_interval: float = Field(300.0, env="REDIRECT_SNAPSHOT_REBUILD_INTERVAL")
+    redirect_cache_preload_size: int = Field(1000, env="REDIRECT_CACHE_PRELOAD_SIZE")
+    redirect_cache_preload_source: str = Field("clicks", env="REDIRECT_CACHE_PRELOAD_SOURCE")
+    redirect_cache_preload_days: int = Field(7, env="REDIRECT_CACHE_PRELOAD_DAYS")
+    redirect_negative_cache_size: int = Field(10000, env="REDIRECT_NEGATIVE_CACHE_SIZE")
+    redirect_negative_cache_ttl: float = Field(5.0, env="REDIRECT_NEGATIVE_CACHE_TTL")
+    key_filter_enabled: bool = Field(True, env="KEY_FILTER_ENABLED")
+    key_filter_capacity: int = Field(1000000, env="KEY_FILTER_CAPACITY")
+    key_filter_error_rate: float = Field(0.01, env="KEY_FILTER_ERROR_RATE")
+    key_filter_refresh_interval: float = Field(1.0, env="KEY_FILTER_REFRESH_INTERVAL")
+    key_filter_rebuild_interval: float = Field(3600.0, env="KEY_FILTER_REBUILD_INTERVAL")
+    token_cache_size: int = Field(10000, env="TOKEN_CACHE_SIZE")
+    # Also how long each worker may keep accepting the token of a user deactivated in the database.
+    token_cache_ttl: float = Field(300.0, env="TOKEN_CACHE_TTL")
+    token_negative_cache_size: int = Field(10000, env="TOKEN_NEGATIVE_CACHE_SIZE")
+    token_negative_cache_ttl: float = Field(30.0, env="TOKEN_NEGATIVE_CACHE_TTL")
+    keygen_strategy: str = Field("random", env="KEYGEN_STRATEGY")
+    keygen_length: int = Field(8, env="KEYGEN_LENGTH")
+    keygen_max_retries: int = Field(3, env="KEYGEN_MAX_RETRIES")
+    keygen_scramble: bool = Field(True, env="KEYGEN_SCRAMBLE")
+    keygen_secret: str = Field("", env="KEYGEN_SECRET")
+    status_page_size: int = Field(1000, env="STATUS_PAGE_SIZE")
+    status_max_page_size: int = Field(10000, env="STATUS_MAX_PAGE_SIZE")
+    status_stream_chunk_size: int = Field(1000, env="STATUS_STREAM_CHUNK_SIZE")
+    batch_max_items: int = Field(10000, env="BATCH_MAX_ITEMS")
+    transfer_chunk_size: int = Field(10000, env="TRANSFER_CHUNK_SIZE")
+    import_max_reported_errors: int = Field(1000, env="IMPORT_MAX_REPORTED_ERRORS")
+    link_sweep_enabled: bool = Field(True, env="LINK_SWEEP_ENABLED")
+    link_sweep_interval: float = Field(60.0, env="LINK_SWEEP_INTERVAL")
+    link_sweep_batch_size: int = Field(1000, env="LINK_SWEEP_BATCH_SIZE")
+    link_archive_after_days: int = Field(30, env="LINK_ARCHIVE_AFTER_DAYS")
+    clicks_enabled: bool = Field(True, env="CLICKS_ENABLED")
+    click_queue_size: int = Field(10000, env="CLICK_QUEUE_SIZE")
+    click_batch_size: int = Field(500, env="CLICK_BATCH_SIZE")
+    click_flush_interval_ms: int = Field(1000, env="CLICK_FLUSH_INTERVAL_MS")
+    click_shutdown_timeout: float = Field(10.0, env="CLICK_SHUTDOWN_TIMEOUT")
+    click_ip_salt: str = Field("", env="CLICK_IP_SALT")
+    shutdown_drain_timeout: float = Field(10.0, env="SHUTDOWN_DRAIN_TIMEOUT")
+    admission_enabled: bool = Field(True, env="ADMISSION_ENABLED")
+    admission_queue_timeout: float = Field(1.0, env="ADMISSION_QUEUE_TIMEOUT")
+    admission_retry_after: int = Field(1, env="ADMISSION_RETRY_AFTER")
+    admission_redirect_limit: int = Field(256, env="ADMISSION_REDIRECT_LIMIT")
+    admission_redirect_queue: int = Field(1024, env="ADMISSION_REDIRECT_QUEUE")
+    admission_write_limit: int = Field(6, env="ADMISSION_WRITE_LIMIT")
+    admission_write_queue: int = Field(64, env="ADMISSION_WRITE_QUEUE")
+    admission_listing_limit: int = Field(3, env="ADMISSION_LISTING_LIMIT")
+    admission_listing_queue: int = Field(16, env="ADMISSION_LISTING_QUEUE")
+    admission_registration_limit: int = Field(2, env="ADMISSION_REGISTRATION_LIMIT")
+    admission_registration_queue: int = Field(16, env="ADMISSION_REGISTRATION_QUEUE")
+    admission_health_limit: int = Field(1, env="ADMISSION_HEALTH_LIMIT")
+    admission_health_queue: int = Field(4, env="ADMISSION_HEALTH_QUEUE")
 
     class Config:
         env_file = ENV_FILE_PATH
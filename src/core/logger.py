@@ -1,7 +1,122 @@
+import atexit
+import json
+import logging
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
 from src.core.config import settings
 
 LOG_FORMAT = "%(asctime)s - %(name)s -  - [%(filename)s:%(lineno)d] - %(levelname)s - %(message)s"
-LOG_DEFAULT_HANDLERS = ["console", "file"]  # Added "file" here
+LOG_DEFAULT_HANDLERS = ["queue"]
+
+# Loggers on the redirect and fetch paths; their records below WARNING are rate limited.
+HOT_PATH_LOGGERS = ["src.services.url_services", "src.api.v1.url_routes"]
+
+_RESERVED_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class StructuredFormatter(logging.Formatter):
+    """
+    Render records as one JSON object per line; anything passed via `extra=` becomes a field.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "file": record.filename,
+            "line": record.lineno,
+        }
+        payload.update({key: value for key, value in vars(record).items() if key not in _RESERVED_RECORD_ATTRS})
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Token bucket per logger: lets through `rate` records per second (with bursts of up to `burst`)
+    below WARNING and drops the rest. The next record that passes carries the number of records
+    suppressed in between as `suppressed`.
+    """
+
+    def __init__(self, rate: float, burst: int) -> None:
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[str, list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+
+        now = time.monotonic()
+        bucket = self._buckets.get(record.name)
+        if bucket is None:
+            bucket = self._buckets[record.name] = [float(self.burst), now, 0]
+        tokens, updated_at, suppressed = bucket
+        tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+
+        if tokens < 1:
+            bucket[:] = [tokens, now, suppressed + 1]
+            return False
+
+        bucket[:] = [tokens - 1, now, 0]
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+_hot_path_filter = RateLimitFilter(rate=settings.hot_path_log_rate, burst=settings.hot_path_log_burst)
+
+
+def hot_path_filter() -> RateLimitFilter:
+    # A single shared instance, so repeated dictConfig() calls do not stack filters on the loggers.
+    return _hot_path_filter
+
+
+_log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+_listener: Optional[QueueListener] = None
+_listener_lock = threading.Lock()
+
+
+def _build_formatter() -> logging.Formatter:
+    if settings.log_format == "json":
+        return StructuredFormatter()
+    return logging.Formatter(LOG_FORMAT)
+
+
+def start_listener() -> QueueListener:
+    """
+    Start the process-wide listener that writes queued records to the console and the log file
+    on its own thread, so the event loop never blocks on disk or terminal I/O.
+    """
+    global _listener
+    with _listener_lock:
+        if _listener is None:
+            formatter = _build_formatter()
+            console = logging.StreamHandler()
+            console.setLevel(logging.DEBUG)
+            console.setFormatter(formatter)
+            file = logging.FileHandler(settings.log_file, mode="w")
+            file.setLevel(logging.INFO)
+            file.setFormatter(formatter)
+
+            _listener = QueueListener(_log_queue, console, file, respect_handler_level=True)
+            _listener.start()
+            atexit.register(_listener.stop)
+    return _listener
+
+
+def queue_handler() -> QueueHandler:
+    start_listener()
+    return QueueHandler(_log_queue)
+
 
 LOGGING = {
     "version": 1,
@@ -9,18 +124,13 @@ LOGGING = {
     "formatters": {
         "verbose": {"format": LOG_FORMAT},
     },
+    "filters": {
+        "hot_path": {"()": hot_path_filter},
+    },
     "handlers": {
-        "console": {
+        "queue": {
+            "()": queue_handler,
             "level": "DEBUG",
-            "class": "logging.StreamHandler",
-            "formatter": "verbose",
-        },
-        "file": {  # New File Handler
-            "level": "INFO",
-            "class": "logging.FileHandler",
-            "formatter": "verbose",
-            "filename": "app.log",  # Specify your log file name here
-            "mode": "w",  # Append mode
         },
     },
     "loggers": {
@@ -28,6 +138,12 @@ LOGGING = {
             "handlers": LOG_DEFAULT_HANDLERS,
             "level": settings.app_debug_level,
         },
+        **{name: {"filters": ["hot_path"]} for name in HOT_PATH_LOGGERS},
+        # SQL echo goes through the queue like everything else instead of engine(echo=True)'s own handler.
+        "sqlalchemy.engine": {"level": "INFO" if settings.db_echo else "WARNING"},
+        "sqlalchemy.pool": {"level": "WARNING"},
+        # SQLAlchemy names pool loggers after the pool class, so the timed subclass needs its own entry.
+        "src.db.db_connector.TimedAsyncAdaptedQueuePool": {"level": "WARNING"},
     },
     "root": {
         "level": "INFO",
@@ -0,0 +1,258 @@
+import asyncio
+import bisect
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from src.core.cache import TTLCache
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 4, 5, 8, 13, 21, 34)
+
+LabelValues = Tuple[str, ...]
+
+# Metrics are only ever updated from the event loop thread (SQLAlchemy engine events run in
+# greenlets on that same thread), so plain dict/list updates need no locking.
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {value}"
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # Per label set: [per-bucket counts (last one is +Inf), sum]
+        self._values: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        entry = self._values.get(labels)
+        if entry is None:
+            entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def samples(self) -> Iterable[str]:
+        for labels, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}"
+
+
+class CallbackMetric:
+    """
+    A gauge or counter whose values are read from `collect` at scrape time, for state that is
+    already tracked elsewhere (pool sizes, cache counters) and would be wasteful to mirror.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        collect: Callable[[], Iterable[Tuple[LabelValues, float]]],
+        labelnames: Sequence[str] = (),
+        type: str = "gauge",
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.type = type
+        self.collect = collect
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in self.collect():
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {value}"
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: List = []
+        self._caches: List[TTLCache] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def track_cache(self, cache: TTLCache) -> TTLCache:
+        self._caches.append(cache)
+        return cache
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+    def _cache_values(self, attribute: str) -> Iterable[Tuple[LabelValues, float]]:
+        for cache in self._caches:
+            yield (cache.name,), getattr(cache, attribute)
+
+
+registry = Registry()
+
+http_requests = registry.register(
+    Counter("http_requests_total", "HTTP requests by route, method and status.", ["route", "method", "status"])
+)
+http_request_duration = registry.register(
+    Histogram("http_request_duration_seconds", "HTTP request latency by route.", ["route", "method"])
+)
+db_query_duration = registry.register(
+    Histogram("db_query_duration_seconds", "Database statement latency by statement type.", ["statement"])
+)
+db_pool_wait = registry.register(
+    Histogram("db_pool_wait_seconds", "Time spent waiting to check out a pooled connection.")
+)
+http_request_db_queries = registry.register(
+    Histogram(
+        "http_request_db_queries",
+        "Database statements executed per HTTP request.",
+        ["route", "method"],
+        QUERY_COUNT_BUCKETS,
+    )
+)
+
+# Statement count of the request being handled. SQLAlchemy's greenlets share the calling task's
+# context, so cursor events fired for a request see that request's counter.
+_request_queries: ContextVar[Optional[list]] = ContextVar("request_queries", default=None)
+
+
+def count_db_query() -> None:
+    counter = _request_queries.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+for attribute, kind in (("hits", "counter"), ("misses", "counter"), ("evictions", "counter")):
+    registry.register(
+        CallbackMetric(
+            f"cache_{attribute}_total",
+            f"In-process cache {attribute}.",
+            lambda attribute=attribute: registry._cache_values(attribute),
+            ["cache"],
+            kind,
+        )
+    )
+registry.register(
+    CallbackMetric(
+        "cache_entries",
+        "Entries currently held by in-process caches.",
+        lambda: (((cache.name,), len(cache)) for cache in registry._caches),
+        ["cache"],
+    )
+)
+
+
+class InFlightRequests:
+    """
+    Count of HTTP requests being handled, so shutdown can wait for them before tearing down what
+    they depend on.
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+        self._idle: Optional[asyncio.Event] = None
+
+    def enter(self) -> None:
+        self.count += 1
+
+    def exit(self) -> None:
+        self.count -= 1
+        if self.count == 0 and self._idle is not None:
+            self._idle.set()
+
+    async def drain(self, timeout: float) -> bool:
+        """
+        Wait up to `timeout` seconds for in-flight requests to finish. Returns False on timeout.
+        """
+        if self.count == 0:
+            return True
+        self._idle = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._idle = None
+
+
+in_flight = InFlightRequests()
+registry.register(
+    CallbackMetric("http_requests_in_flight", "HTTP requests currently being handled.", lambda: [((), in_flight.count)])
+)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording latency and status per route template. Kept out of
+    Starlette's BaseHTTPMiddleware, which adds a task and a memory stream to every request.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code: Optional[int] = None
+        queries = [0]
+        reset_token = _request_queries.set(queries)
+        in_flight.enter()
+
+        async def send_wrapper(message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight.exit()
+            _request_queries.reset(reset_token)
+            route = scope.get("route")
+            path = scope.get("metrics_route") or (route.path if route is not None else "unmatched")
+            method = scope["method"]
+            http_request_duration.observe(time.perf_counter() - start, path, method)
+            http_requests.inc(path, method, str(status_code or 500))
+            http_request_db_queries.observe(queries[0], path, method)
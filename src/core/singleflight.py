@@ -0,0 +1,80 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, List, TypeVar
+
+from src.core.metrics import CallbackMetric, registry
+
+T = TypeVar("T")
+
+
+class _LeaderCancelled(Exception):
+    pass
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key: the first caller runs the lookup, the others
+    wait for it and share its result or exception. If the first caller is cancelled (its client
+    went away), one of the waiters takes over instead of inheriting the cancellation.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.leaders = 0
+        self.coalesced = 0
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        flights.append(self)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        while key in self._calls:
+            try:
+                # Shielded so a waiter being cancelled does not cancel the shared call.
+                result = await asyncio.shield(self._calls[key])
+            except _LeaderCancelled:
+                continue
+            except Exception:
+                self.coalesced += 1
+                raise
+            # Counted once the shared outcome arrives, not for each wait on a leader that went away.
+            self.coalesced += 1
+            return result
+
+        call = asyncio.get_running_loop().create_future()
+        self._calls[key] = call
+        self.leaders += 1
+        try:
+            result = await fn()
+        except Exception as e:
+            self._fail(call, e)
+            raise
+        except BaseException:
+            # Cancelled: let a waiter run the lookup rather than cancelling all of them.
+            self._fail(call, _LeaderCancelled())
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
+
+    @staticmethod
+    def _fail(call: asyncio.Future, exception: BaseException) -> None:
+        call.set_exception(exception)
+        # Mark it retrieved; with nobody waiting asyncio would log it as never retrieved.
+        call.exception()
+
+
+flights: List[SingleFlight] = []
+
+registry.register(
+    CallbackMetric(
+        "singleflight_calls_total",
+        "Lookups by whether they ran (leader) or waited on an identical one in flight (coalesced).",
+        lambda: [
+            sample
+            for flight in flights
+            for sample in (((flight.name, "leader"), flight.leaders), ((flight.name, "coalesced"), flight.coalesced))
+        ],
+        ["lookup", "role"],
+        "counter",
+    )
+)
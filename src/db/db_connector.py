@@ -1,14 +1,245 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+import asyncio
+import itertools
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional
+
+from fastapi import Header
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
+from src.core.cache import TTLCache
 from src.core.config import settings
+from src.core.metrics import CallbackMetric, Counter, count_db_query, db_pool_wait, db_query_duration, registry
+
+
+class TimedAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Default async pool that also records how long each checkout waited for a connection.
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            db_pool_wait.observe(time.perf_counter() - start)
+
+
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany) -> None:
+    context._query_started_at = time.perf_counter()
+
+
+def _record_query_time(conn, cursor, statement, parameters, context, executemany) -> None:
+    statement_type = statement.lstrip().split(None, 1)[0].upper() if statement else "UNKNOWN"
+    db_query_duration.observe(time.perf_counter() - context._query_started_at, statement_type)
+    count_db_query()
+
+
+STORAGE_BACKENDS = ("postgres", "sqlite", "memory")
+MEMORY_DATABASE_URL = "sqlite+aiosqlite://"
+
+
+def storage_url() -> str:
+    """
+    Primary database URL for STORAGE_BACKEND: DATABASE_URL for `postgres`, a SQLite file for `sqlite`
+    (DATABASE_URL if it already names one, else SQLITE_PATH) and a private in-memory SQLite database
+    for `memory`, which lasts as long as the process.
+    """
+    if settings.storage_backend not in STORAGE_BACKENDS:
+        raise ValueError(f"Unknown storage backend: {settings.storage_backend}")
+    if settings.storage_backend == "memory":
+        return MEMORY_DATABASE_URL
+    if settings.storage_backend == "sqlite" and not (
+        settings.db_url and make_url(settings.db_url).get_backend_name() == "sqlite"
+    ):
+        return f"sqlite+aiosqlite:///{settings.sqlite_path}"
+    return settings.db_url
+
 
-engine = create_async_engine(settings.db_url, echo=True, future=True)
+def build_engine(url: str) -> AsyncEngine:
+    engine_options = {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+    parsed_url = make_url(url)
+    if parsed_url.get_backend_name() == "sqlite":
+        # SQLite backends (tests, benchmarks) have no schemas.
+        engine_options["execution_options"] = {"schema_translate_map": {"url_shortener": None}}
+        if parsed_url.database in (None, "", ":memory:"):
+            # Every connection to ":memory:" opens a database of its own; keep exactly one, for good.
+            engine_options.update(pool_size=1, max_overflow=0, pool_recycle=-1, pool_pre_ping=False)
+
+    new_engine = create_async_engine(url, future=True, poolclass=TimedAsyncAdaptedQueuePool, **engine_options)
+    event.listen(new_engine.sync_engine, "before_cursor_execute", _start_query_timer)
+    event.listen(new_engine.sync_engine, "after_cursor_execute", _record_query_time)
+    return new_engine
+
+
+# The primary takes every write; replicas (DATABASE_REPLICA_URLS) serve the read-only paths.
+engine = build_engine(storage_url())
 async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
+replica_engines: List[AsyncEngine] = [
+    build_engine(url.strip()) for url in settings.db_replica_urls.split(",") if url.strip()
+]
+replica_sessions = [
+    sessionmaker(replica, class_=AsyncSession, expire_on_commit=False, info={"replica": True})
+    for replica in replica_engines
+]
+
+# Shard 0 is the primary, which also keeps users and clicks; DATABASE_SHARD_URLS adds databases that
+# hold urls only. Each shard has its own pool; replicas serve shard 0 only.
+shard_engines: List[AsyncEngine] = [
+    engine,
+    *(build_engine(url.strip()) for url in settings.db_shard_urls.split(",") if url.strip()),
+]
+shard_sessions = [
+    async_session,
+    *(sessionmaker(shard, class_=AsyncSession, expire_on_commit=False) for shard in shard_engines[1:]),
+]
+shard_count = len(shard_sessions)
+
 Base = declarative_base()
 
+# Bearer tokens and short keys written recently; reads for them stay on the primary until
+# replicas have caught up.
+recent_writers = TTLCache("read_your_writes", maxsize=settings.token_cache_size, ttl=settings.read_your_writes_window)
+_round_robin = itertools.cycle(range(len(replica_sessions))) if replica_sessions else None
+
+db_reads = registry.register(
+    Counter("db_reads_total", "Read-only sessions by the database they were routed to.", ["target"])
+)
+
+
+def remember_write(token: Optional[str] = None, key: Optional[str] = None) -> None:
+    if replica_sessions:
+        for sticky in (("token", token), ("key", key)):
+            if sticky[1]:
+                recent_writers.set(sticky, True)
+
+
+def _written_recently(token: Optional[str], key: Optional[str]) -> bool:
+    return any(
+        value and recent_writers.get((kind, value)) is not None for kind, value in (("token", token), ("key", key))
+    )
+
+
+def read_session_factory(token: Optional[str] = None, key: Optional[str] = None, primary: bool = False) -> sessionmaker:
+    """
+    Pick the session factory for a read-only unit of work: a replica chosen round-robin or by fewest
+    checked-out connections (DB_REPLICA_SELECTION), or the primary when there are no replicas, the
+    caller asks for it, or `token` or `key` was written within the read-your-writes window.
+    """
+    if not replica_sessions or primary or _written_recently(token, key):
+        db_reads.inc("primary")
+        return async_session
+
+    if settings.db_replica_selection == "least_busy":
+        index = min(range(len(replica_engines)), key=lambda i: replica_engines[i].pool.checkedout())
+    else:
+        index = next(_round_robin)
+    db_reads.inc(f"replica{index}")
+    return replica_sessions[index]
+
+
+def is_replica(session: AsyncSession) -> bool:
+    return session.info.get("replica", False)
+
+
+async def fetch_first(db: AsyncSession, stmt):
+    """
+    First row of `stmt`. A miss on a replica is retried on the primary, which may hold rows the
+    replica has not replayed yet, so replication lag never turns a fresh link or user into a 404/401.
+    """
+    row = (await db.execute(stmt)).first()
+    if row is None and is_replica(db):
+        async with async_session() as primary:
+            row = (await primary.execute(stmt)).first()
+    return row
+
+
+@asynccontextmanager
+async def shard_session(db: AsyncSession, shard: int) -> AsyncIterator[AsyncSession]:
+    """
+    Session for urls rows on `shard`: `db` itself for shard 0, otherwise a new session on the shard.
+    """
+    if shard == 0:
+        yield db
+        return
+    async with shard_sessions[shard]() as session:
+        yield session
+
+
+async def _warm_up_pool(target: AsyncEngine, connections: int) -> None:
+    # Hold every connection until all are open, otherwise the pool hands the first one out again.
+    conns = [target.connect() for _ in range(min(connections, target.pool.size()))]
+    try:
+        await asyncio.gather(*(conn.start() for conn in conns))
+        await asyncio.gather(*(conn.execute(text("SELECT 1")) for conn in conns))
+    finally:
+        for conn in conns:
+            if conn.sync_connection is not None:
+                await conn.close()
+
+
+async def warm_up_pools(connections: int = settings.db_pool_warm_connections) -> None:
+    """
+    Open up to `connections` pooled connections on every engine (at most its pool size) and run a
+    trivial query on each, so the first requests after startup do not pay for connecting.
+    """
+    await asyncio.gather(*(_warm_up_pool(each, connections) for each in [*shard_engines, *replica_engines]))
+
+
+async def create_local_schema() -> None:
+    """
+    Create all tables on the SQLite backends, which the (PostgreSQL) Alembic migrations do not cover.
+    """
+    if settings.storage_backend == "postgres":
+        return
+    for each in shard_engines:
+        async with each.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+
+async def dispose_engines() -> None:
+    for each in [*shard_engines, *replica_engines]:
+        await each.dispose()
+
+
+def _pool_samples():
+    engines = [
+        ("primary", engine),
+        *((f"shard{i}", shard) for i, shard in enumerate(shard_engines) if i > 0),
+        *((f"replica{i}", replica) for i, replica in enumerate(replica_engines)),
+    ]
+    for name, each in engines:
+        yield (name, "checked_out"), each.pool.checkedout()
+        yield (name, "overflow"), max(each.pool.overflow(), 0)
+        yield (name, "size"), each.pool.size()
+
+
+registry.register(CallbackMetric("db_pool_connections", "Pooled connections by state.", _pool_samples, ["db", "state"]))
+
 
 async def get_async_session() -> AsyncSession:
     async with async_session() as session:
         yield session
+
+
+async def get_read_session(
+    authorization: Optional[str] = Header(None), x_read_consistency: Optional[str] = Header(None)
+) -> AsyncSession:
+    """
+    Session for read-only endpoints. Requests whose bearer token wrote recently, or that send
+    `X-Read-Consistency: primary`, read from the primary.
+    """
+    token = authorization.partition(" ")[2] if authorization else None
+    factory = read_session_factory(token, primary=x_read_consistency == "primary")
+    async with factory() as session:
+        yield session
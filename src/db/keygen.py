@@ -1,7 +1,162 @@
+import asyncio
+import hashlib
 import secrets
 import string
+from abc import ABC, abstractmethod
+from typing import List, Optional, Set
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.config import settings
+
+RANDOM_ALPHABET = string.ascii_uppercase + string.digits
+BASE62_ALPHABET = string.digits + string.ascii_uppercase + string.ascii_lowercase
+KEY_SEQUENCE = "url_shortener.url_key_seq"
+
+
+def _encode(number: int, alphabet: str, length: int) -> str:
+    base = len(alphabet)
+    chars = []
+    while number:
+        number, remainder = divmod(number, base)
+        chars.append(alphabet[remainder])
+    return "".join(reversed(chars)).rjust(max(length, 1), alphabet[0])
 
 
 def create_random_key(length: int = 8) -> str:
-    chars = string.ascii_uppercase + string.digits
-    return "".join(secrets.choice(chars) for _ in range(length))
+    # One CSPRNG draw per key instead of one per character.
+    return _encode(secrets.randbelow(len(RANDOM_ALPHABET) ** length), RANDOM_ALPHABET, length)
+
+
+def create_random_keys(count: int, length: int = 8) -> List[str]:
+    keys: Set[str] = set()
+    while len(keys) < count:
+        keys.add(create_random_key(length))
+    return list(keys)
+
+
+def base62_encode(number: int, length: int = 0) -> str:
+    return _encode(number, BASE62_ALPHABET, length)
+
+
+class FeistelPermutation:
+    """
+    Keyed bijection on [0, 62 ** length). A balanced Feistel network over the smallest even
+    bit width that covers the domain, with cycle-walking to stay inside it, so sequential ids
+    map to keys that cannot be enumerated without the secret.
+    """
+
+    rounds = 4
+
+    def __init__(self, secret: str, length: int) -> None:
+        self.domain = 62**length
+        self.half_bits = ((self.domain - 1).bit_length() + 1) // 2
+        self.mask = (1 << self.half_bits) - 1
+        self.round_keys = [
+            hashlib.blake2b(f"{secret}:{index}".encode(), digest_size=16).digest() for index in range(self.rounds)
+        ]
+
+    def _round(self, value: int, key: bytes) -> int:
+        digest = hashlib.blake2b(value.to_bytes(8, "big"), key=key, digest_size=8).digest()
+        return int.from_bytes(digest, "big") & self.mask
+
+    def _encrypt(self, value: int) -> int:
+        left, right = value >> self.half_bits, value & self.mask
+        for key in self.round_keys:
+            left, right = right, left ^ self._round(right, key)
+        return (left << self.half_bits) | right
+
+    def permute(self, value: int) -> int:
+        value = self._encrypt(value)
+        while value >= self.domain:
+            value = self._encrypt(value)
+        return value
+
+
+class KeyAllocator(ABC):
+    """
+    Strategy for producing short keys. `max_retries` is how many times a caller should retry
+    an insert whose key hit the unique index before giving up.
+    """
+
+    max_retries = 0
+
+    @abstractmethod
+    async def allocate(self, db: AsyncSession, count: int = 1) -> List[str]:
+        """
+        Return `count` new keys.
+        """
+
+
+class RandomKeyAllocator(KeyAllocator):
+    def __init__(self, length: int, max_retries: int) -> None:
+        self.length = length
+        self.max_retries = max_retries
+
+    async def allocate(self, db: AsyncSession, count: int = 1) -> List[str]:
+        return create_random_keys(count, self.length)
+
+
+class SequenceKeyAllocator(KeyAllocator):
+    """
+    Leases blocks of ids from a Postgres sequence whose INCREMENT BY is the block size, so each
+    worker hands out ids locally and only touches the database once per block. Ids are encoded
+    as base62, optionally passed through a keyed permutation first.
+    """
+
+    def __init__(self, length: int, max_retries: int, scramble: bool, secret: str) -> None:
+        self.length = length
+        self.max_retries = max_retries
+        self.permutation = FeistelPermutation(secret, length) if scramble else None
+        self._next = 0
+        self._end = 0
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def _lease(self, db: AsyncSession) -> None:
+        result = await db.execute(
+            text(
+                "SELECT nextval(:sequence) AS start, increment_by FROM pg_sequences "
+                "WHERE schemaname = 'url_shortener' AND sequencename = 'url_key_seq'"
+            ),
+            {"sequence": KEY_SEQUENCE},
+        )
+        start, block_size = result.one()
+        self._next, self._end = start, start + block_size
+
+    async def allocate(self, db: AsyncSession, count: int = 1) -> List[str]:
+        # Created lazily so the lock binds to the running event loop.
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            ids: List[int] = []
+            while len(ids) < count:
+                if self._next >= self._end:
+                    await self._lease(db)
+                take = min(count - len(ids), self._end - self._next)
+                ids.extend(range(self._next, self._next + take))
+                self._next += take
+
+        if self.permutation is not None:
+            return [base62_encode(self.permutation.permute(value), self.length) for value in ids]
+        return [base62_encode(value) for value in ids]
+
+
+def build_key_allocator() -> KeyAllocator:
+    if settings.keygen_strategy == "sequence":
+        if settings.keygen_scramble and not settings.keygen_secret:
+            # Scrambling with a known key makes the keys as enumerable as the plain sequence.
+            raise ValueError("KEYGEN_SCRAMBLE requires KEYGEN_SECRET to be set")
+        return SequenceKeyAllocator(
+            length=settings.keygen_length,
+            max_retries=settings.keygen_max_retries,
+            scramble=settings.keygen_scramble,
+            secret=settings.keygen_secret,
+        )
+    if settings.keygen_strategy == "random":
+        return RandomKeyAllocator(length=settings.keygen_length, max_retries=settings.keygen_max_retries)
+    raise ValueError(f"Unknown key generation strategy: {settings.keygen_strategy}")
+
+
+key_allocator = build_key_allocator()
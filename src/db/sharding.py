@@ -0,0 +1,76 @@
+import itertools
+import random
+from typing import List, Optional, Tuple
+
+from src.db.db_connector import shard_count
+from src.db.keygen import BASE62_ALPHABET
+from src.core.config import settings
+
+# Sharded keys look like "3-AB12CD34": the owning shard as a base62 digit, then the allocated key.
+# Allocators never emit the separator, so keys created before sharding was enabled stay unambiguous;
+# they all live on shard 0.
+SHARD_SEPARATOR = "-"
+MAX_SHARDS = len(BASE62_ALPHABET)
+_SHARD_DIGITS = {digit: index for index, digit in enumerate(BASE62_ALPHABET)}
+
+if shard_count > MAX_SHARDS:
+    raise ValueError(f"At most {MAX_SHARDS} shards are supported, got {shard_count}")
+
+
+def sharded() -> bool:
+    return shard_count > 1
+
+
+def shard_for_key(key: str) -> int:
+    if len(key) > 2 and key[1] == SHARD_SEPARATOR:
+        shard = _SHARD_DIGITS.get(key[0], 0)
+        return shard if shard < shard_count else 0
+    return 0
+
+
+def shard_key(shard: int, key: str) -> str:
+    return f"{BASE62_ALPHABET[shard]}{SHARD_SEPARATOR}{key}" if sharded() else key
+
+
+# Listing cursors stay plain integers: in sharded mode they carry the shard next to the id, as ids
+# repeat across shards and pages are ordered by (id, shard).
+def encode_cursor(id: int, shard: int) -> int:
+    return id * MAX_SHARDS + shard if sharded() else id
+
+
+def decode_cursor(cursor: int) -> Tuple[int, int]:
+    return divmod(cursor, MAX_SHARDS) if sharded() else (cursor, 0)
+
+
+class ShardPicker:
+    """
+    Chooses the shard for new links: `round_robin` spreads writes evenly, `random` does so without
+    shared state, and `user` keeps each user's links on one shard (user_id modulo the shard count).
+    """
+
+    def __init__(self, policy: str, count: int) -> None:
+        if policy not in ("round_robin", "random", "user"):
+            raise ValueError(f"Unknown shard policy: {policy}")
+        self.policy = policy
+        self.count = count
+        self._round_robin = itertools.cycle(range(count))
+
+    def pick(self, user_id: Optional[int] = None) -> int:
+        if self.count == 1:
+            return 0
+        if self.policy == "user" and user_id is not None:
+            return user_id % self.count
+        if self.policy == "random":
+            return random.randrange(self.count)
+        return next(self._round_robin)
+
+    def shards_for_user(self, user_id: int) -> List[int]:
+        """
+        Shards that may hold links of `user_id`.
+        """
+        if self.policy == "user":
+            return [self.pick(user_id)]
+        return list(range(self.count))
+
+
+shard_picker = ShardPicker(settings.db_shard_policy, shard_count)
@@ -1,8 +1,87 @@
+import logging.config
+
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse, PlainTextResponse
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.api.fast_redirect import RedirectFastPath
 from src.api.v1 import url_routes, users_routes
+from src.core.admission import AdmissionControlMiddleware
+from src.core.config import settings
+from src.core.logger import LOGGING
+from src.core.metrics import MetricsMiddleware, in_flight, registry
+from src.db.db_connector import async_session, create_local_schema, dispose_engines, warm_up_pools
+from src.services.click_services import click_recorder
+from src.services.key_filter import key_filters
+from src.services.link_sweeper import link_sweepers
+from src.services.redirect_snapshot import redirect_snapshots
+from src.services.url_services import preload_redirect_cache
 
 
-app = FastAPI()
+logging.config.dictConfig(LOGGING)
+logger = logging.getLogger(__name__)
+
+# orjson for every JSON response; the hot routes also skip response_model validation.
+app = FastAPI(default_response_class=ORJSONResponse)
 
 app.include_router(url_routes.router)
 app.include_router(users_routes.router)
+# Middleware added last runs first: metrics wrap admission control, which wraps the redirect fast path.
+app.add_middleware(RedirectFastPath)
+app.add_middleware(AdmissionControlMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics() -> PlainTextResponse:
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.on_event("startup")
+async def create_schema() -> None:
+    await create_local_schema()
+
+
+@app.on_event("startup")
+async def warm_up() -> None:
+    # Open pooled connections and fill the redirect cache before the first request, so a fresh
+    # deploy does not start out cold. Failures only cost the warm-up, never the startup.
+    try:
+        await warm_up_pools()
+        async with async_session() as session:
+            await preload_redirect_cache(session)
+    except (OSError, SQLAlchemyError) as e:
+        logger.warning("Warm-up failed, starting cold: %s", e)
+
+
+@app.on_event("startup")
+async def start_background_tasks() -> None:
+    if settings.clicks_enabled:
+        click_recorder.start()
+    # Key filters, snapshots and sweepers run once per urls shard.
+    if settings.key_filter_enabled:
+        for key_filter in key_filters:
+            key_filter.start()
+    if settings.redirect_snapshot_enabled:
+        for redirect_snapshot in redirect_snapshots:
+            redirect_snapshot.start()
+    if settings.link_sweep_enabled:
+        for link_sweeper in link_sweepers:
+            link_sweeper.start()
+
+
+@app.on_event("shutdown")
+async def stop_background_tasks() -> None:
+    # Requests still being handled may record clicks or write links; let them finish first.
+    if not await in_flight.drain(settings.shutdown_drain_timeout):
+        logger.warning(
+            "%d requests still in flight after %.1fs, shutting down", in_flight.count, settings.shutdown_drain_timeout
+        )
+    for link_sweeper in link_sweepers:
+        await link_sweeper.stop()
+    for redirect_snapshot in redirect_snapshots:
+        await redirect_snapshot.stop()
+    for key_filter in key_filters:
+        await key_filter.stop()
+    await click_recorder.stop()
+    await dispose_engines()
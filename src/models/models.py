@@ -1,4 +1,6 @@
-from sqlalchemy import Boolean, Column, Integer, String, ForeignKey, Enum
+from sqlalchemy import (
+    DDL, BigInteger, Boolean, Column, DateTime, Integer, LargeBinary, String, Enum, Index, event, func, text
+)
 from sqlalchemy.orm import relationship
 
 from src.db.db_connector import Base
@@ -10,22 +12,127 @@ class User(Base):
 
     id = Column(Integer, primary_key=True)
     username = Column(String, unique=True, index=True)
-    token = Column(String)
+    token = Column(String, unique=True, index=True)
     is_active = Column(Boolean, default=True)
+    # Bumped whenever one of the user's links is created or deactivated; the status listing's ETag.
+    links_version = Column(Integer, nullable=False, default=0, server_default="0")
 
-    urls = relationship("URL", back_populates="user")
+    urls = relationship("URL", back_populates="user", primaryjoin="User.id == foreign(URL.user_id)")
 
 
 class URL(Base):
     __tablename__ = "urls"
-    __table_args__ = {"schema": "url_shortener"}
+    __table_args__ = (
+        # Over every row, so the key of a deactivated link is never handed out again; the partial
+        # copy below is the smaller one that live-link lookups use.
+        Index("ix_url_shortener_urls_key", "key", unique=True),
+        Index("ix_url_shortener_urls_key_active", "key", postgresql_where=text("is_active")),
+        # Partial on is_active so these indexes only grow with live links; deactivated rows drop out.
+        # A fixed-width digest instead of the unbounded target_url keeps the index small.
+        Index(
+            "ix_url_shortener_urls_user_id_type_target_digest",
+            "user_id",
+            "type",
+            "target_digest",
+            postgresql_where=text("is_active"),
+        ),
+        Index("ix_url_shortener_urls_short_url", "short_url", postgresql_where=text("is_active")),
+        Index("ix_url_shortener_urls_user_id_id_active", "user_id", "id", postgresql_where=text("is_active")),
+        Index(
+            "ix_url_shortener_urls_expires_at_active",
+            "expires_at",
+            postgresql_where=text("is_active AND expires_at IS NOT NULL"),
+        ),
+        Index(
+            "ix_url_shortener_urls_deactivated_at_inactive", "deactivated_at", postgresql_where=text("NOT is_active")
+        ),
+        Index("ix_url_shortener_urls_created_at_active", "created_at", postgresql_where=text("is_active")),
+        {"schema": "url_shortener"},
+    )
 
     id = Column(Integer, primary_key=True)
-    key = Column(String, unique=True, index=True)
-    target_url = Column(String, index=True)
-    short_url = Column(String, index=True)
+    key = Column(String)
+    target_url = Column(String)
+    # MD5 of target_url, see url_services.target_digest.
+    target_digest = Column(LargeBinary(16))
+    short_url = Column(String)
     is_active = Column(Boolean, default=True)
-    user_id = Column(Integer, ForeignKey("url_shortener.users.id"))
+    # No foreign key: with sharding a link may live in a different database than its user.
+    user_id = Column(Integer)
     type = Column(Enum("public", "private", name="url_type"), default="public")
+    expires_at = Column(DateTime(timezone=True), nullable=True)
+    deactivated_at = Column(DateTime(timezone=True), nullable=True)
+    # The inserting transaction's start time; the key filter and redirect snapshot poll by it.
+    created_at = Column(DateTime(timezone=True), nullable=True, server_default=func.now())
+
+    user = relationship("User", back_populates="urls", primaryjoin="User.id == foreign(URL.user_id)")
+
+
+class URLArchive(Base):
+    """
+    Links moved out of `urls` by the sweeper after staying deactivated for LINK_ARCHIVE_AFTER_DAYS.
+    """
+
+    __tablename__ = "urls_archive"
+    __table_args__ = {"schema": "url_shortener"}
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    # Looked up by the urls_skip_archived_key trigger on every insert into urls.
+    key = Column(String, index=True)
+    target_url = Column(String)
+    short_url = Column(String)
+    user_id = Column(Integer)
+    type = Column(Enum("public", "private", name="url_type"))
+    expires_at = Column(DateTime(timezone=True))
+    deactivated_at = Column(DateTime(timezone=True))
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+# An insert into urls of a key an archived link had is skipped, as ON CONFLICT DO NOTHING would skip
+# a taken key, so archiving never frees a key for reuse; callers retry such rows with a fresh key.
+# Postgres gets the trigger from its migration, the SQLite backends from create_all.
+SKIP_ARCHIVED_KEY_SQLITE = DDL(
+    "CREATE TRIGGER IF NOT EXISTS urls_skip_archived_key BEFORE INSERT ON urls "
+    "WHEN EXISTS (SELECT 1 FROM urls_archive WHERE urls_archive.key = NEW.key) "
+    "BEGIN SELECT RAISE(IGNORE); END"
+)
+event.listen(Base.metadata, "after_create", SKIP_ARCHIVED_KEY_SQLITE.execute_if(dialect="sqlite"))
+
+
+class Click(Base):
+    __tablename__ = "clicks"
+    __table_args__ = {"schema": "url_shortener"}
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    key = Column(String, index=True)
+    clicked_at = Column(DateTime(timezone=True))
+    user_agent = Column(String)
+    referrer = Column(String)
+    ip_hash = Column(String(32))
+
+
+class ClickRollupHourly(Base):
+    __tablename__ = "click_rollups_hourly"
+    __table_args__ = {"schema": "url_shortener"}
+
+    key = Column(String, primary_key=True)
+    bucket = Column(DateTime(timezone=True), primary_key=True)
+    clicks = Column(BigInteger, nullable=False, default=0)
+
+
+class ClickRollupDaily(Base):
+    __tablename__ = "click_rollups_daily"
+    __table_args__ = {"schema": "url_shortener"}
+
+    key = Column(String, primary_key=True)
+    bucket = Column(DateTime(timezone=True), primary_key=True)
+    clicks = Column(BigInteger, nullable=False, default=0)
+
+
+class ReferrerRollup(Base):
+    __tablename__ = "referrer_rollups"
+    __table_args__ = {"schema": "url_shortener"}
 
-    user = relationship("User", back_populates="urls")
+    key = Column(String, primary_key=True)
+    referrer = Column(String, primary_key=True)
+    clicks = Column(BigInteger, nullable=False, default=0)
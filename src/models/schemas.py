@@ -1,5 +1,8 @@
-from pydantic import BaseModel, HttpUrl
+from datetime import datetime, timezone
 from enum import Enum
+from typing import List, Optional
+
+from pydantic import BaseModel, HttpUrl, validator
 
 
 class URLType(str, Enum):
@@ -7,15 +10,59 @@ class URLType(str, Enum):
     private = "private"
 
 
+class StatsGranularity(str, Enum):
+    hour = "hour"
+    day = "day"
+
+
 class URLBase(BaseModel):
     target_url: HttpUrl
     type: URLType = URLType.public
+    expires_at: Optional[datetime] = None
+
+    @validator("expires_at")
+    def expires_in_future(cls, value: Optional[datetime]) -> Optional[datetime]:
+        if value is None:
+            return None
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        if value <= datetime.now(timezone.utc):
+            raise ValueError("expires_at must be in the future")
+        return value
 
 
 class URLResponse(BaseModel):
     key: str
     short_url: str
     target_url: str
+    expires_at: Optional[datetime] = None
+
+
+class BatchURLItemResult(BaseModel):
+    index: int
+    ok: bool
+    target_url: str
+    key: Optional[str] = None
+    short_url: Optional[str] = None
+    error: Optional[str] = None
+
+
+class BatchURLResponse(BaseModel):
+    created: int
+    failed: int
+    items: List[BatchURLItemResult]
+
+
+class ImportRejectedRow(BaseModel):
+    line: int
+    error: str
+
+
+class ImportResponse(BaseModel):
+    rows: int
+    imported: int
+    rejected: int
+    errors: List[ImportRejectedRow]
 
 
 class LinkResponse(BaseModel):
@@ -23,6 +70,7 @@ class LinkResponse(BaseModel):
     short_url: str
     original_url: str
     type: str
+    expires_at: Optional[datetime] = None
 
 
 class UserSchema(BaseModel):
@@ -33,3 +81,21 @@ class UserSchema(BaseModel):
 
     class Config:
         orm_mode = True
+
+
+class StatsPoint(BaseModel):
+    bucket: datetime
+    clicks: int
+
+
+class ReferrerCount(BaseModel):
+    referrer: str
+    clicks: int
+
+
+class URLStatsResponse(BaseModel):
+    key: str
+    total_clicks: int
+    granularity: str
+    series: List[StatsPoint]
+    top_referrers: List[ReferrerCount]
@@ -0,0 +1,276 @@
+import asyncio
+import hashlib
+import logging.config
+import secrets
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+from urllib.parse import urlsplit
+
+from sqlalchemy import func, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.db.db_connector import async_session
+from src.models.models import Click, ClickRollupDaily, ClickRollupHourly, ReferrerRollup
+from src.models.schemas import StatsGranularity
+from src.core.config import settings
+from src.core.metrics import CallbackMetric, registry
+from src.core.logger import LOGGING
+
+
+logging.config.dictConfig(LOGGING)
+logger = logging.getLogger(__name__)
+
+
+class ClickEvent(NamedTuple):
+    key: str
+    clicked_at: datetime
+    user_agent: Optional[str]
+    referrer: Optional[str]
+    ip_hash: Optional[str]
+
+
+DIRECT_REFERRER = "(direct)"
+ROLLUP_MODELS = {StatsGranularity.hour: ClickRollupHourly, StatsGranularity.day: ClickRollupDaily}
+
+
+def _click_ip_salt() -> bytes:
+    if settings.click_ip_salt:
+        return settings.click_ip_salt.encode()[:64]
+    # An unsalted hash of an IPv4 address is reversed by hashing all 2^32 of them.
+    if settings.clicks_enabled:
+        logger.warning("CLICK_IP_SALT is not set; using a random salt, so IP hashes differ between processes")
+    return secrets.token_bytes(32)
+
+
+CLICK_IP_SALT = _click_ip_salt()
+
+
+def hash_client_ip(ip: Optional[str]) -> Optional[str]:
+    if not ip:
+        return None
+    return hashlib.blake2b(ip.encode(), key=CLICK_IP_SALT, digest_size=16).hexdigest()
+
+
+def referrer_host(referrer: Optional[str]) -> str:
+    if not referrer:
+        return DIRECT_REFERRER
+    return urlsplit(referrer).hostname or DIRECT_REFERRER
+
+
+def _upsert(session: AsyncSession, model, rows: List[dict], index_elements: List[str]):
+    """
+    Build an INSERT that adds `clicks` onto existing rollup rows instead of failing on conflict.
+    """
+    dialect = postgresql if session.get_bind().dialect.name == "postgresql" else sqlite
+    stmt = dialect.insert(model).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=index_elements, set_={"clicks": model.clicks + stmt.excluded.clicks}
+    )
+
+
+class ClickRecorder:
+    """
+    Buffers click events in a bounded in-memory queue and writes them to the clicks table
+    from a background task, every `batch_size` events or every `flush_interval` seconds,
+    whichever comes first. Recording never blocks: when the queue is full the event is dropped.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable = async_session,
+        max_queue: int = settings.click_queue_size,
+        batch_size: int = settings.click_batch_size,
+        flush_interval: float = settings.click_flush_interval_ms / 1000,
+    ) -> None:
+        self.session_factory = session_factory
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.recorded = 0
+        self.dropped = 0
+        self.flushed = 0
+        self.failed = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._pending: List[ClickEvent] = []
+        self._closing = False
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def record(self, key: str, user_agent: Optional[str], referrer: Optional[str], client_ip: Optional[str]) -> None:
+        if self._closing or not self.running:
+            self.dropped += 1
+            return
+        event = ClickEvent(key, datetime.now(timezone.utc), user_agent, referrer, hash_client_ip(client_ip))
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return
+        self.recorded += 1
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._closing = False
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self, timeout: float = settings.click_shutdown_timeout) -> None:
+        """
+        Stop accepting events and wait for the background task to flush everything still buffered.
+        """
+        if self._task is None:
+            return
+        self._closing = True
+        done, _ = await asyncio.wait([self._task], timeout=timeout)
+        if not done:
+            logger.warning("Click flush did not finish in %.1fs, %d events lost", timeout, self._queue.qsize())
+            self._task.cancel()
+        self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "recorded": self.recorded,
+            "dropped": self.dropped,
+            "flushed": self.flushed,
+            "failed": self.failed,
+        }
+
+    async def _run(self) -> None:
+        while not self._closing:
+            await self._collect_batch()
+            await self._flush(self._pending)
+            self._pending = []
+
+        batch = self._drain()
+        for start in range(0, len(batch), self.batch_size):
+            await self._flush(batch[start:start + self.batch_size])
+
+    async def _collect_batch(self) -> None:
+        """
+        Wait for the first event, then keep collecting until the batch is full or the flush
+        interval has passed. Idle waits time out every interval so shutdown is noticed.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.flush_interval
+        while len(self._pending) < self.batch_size:
+            try:
+                self._pending.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                if self._pending or self._closing:
+                    break
+                deadline = loop.time() + self.flush_interval
+                continue
+            try:
+                self._pending.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                continue
+
+    def _drain(self) -> List[ClickEvent]:
+        events = []
+        while True:
+            try:
+                events.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                return events
+
+    async def _flush(self, batch: List[ClickEvent]) -> None:
+        if not batch:
+            return
+        try:
+            async with self.session_factory() as session:
+                await self._write(session, batch)
+                await session.commit()
+        except SQLAlchemyError as e:
+            self.failed += len(batch)
+            logger.error("Error flushing %d click events: %s", len(batch), e)
+            return
+        self.flushed += len(batch)
+
+    async def _write(self, session: AsyncSession, batch: List[ClickEvent]) -> None:
+        """
+        Insert the raw events and fold them into the hourly, daily and referrer rollups
+        in the same transaction, so the rollups never drift from the raw click stream.
+        """
+        await session.execute(insert(Click).values([event._asdict() for event in batch]))
+
+        hourly, daily, referrers = Counter(), Counter(), Counter()
+        for event in batch:
+            hour = event.clicked_at.replace(minute=0, second=0, microsecond=0)
+            hourly[(event.key, hour)] += 1
+            daily[(event.key, hour.replace(hour=0))] += 1
+            referrers[(event.key, referrer_host(event.referrer))] += 1
+
+        # Rows are sorted by primary key so concurrent flushers lock them in the same order.
+        for model, counts, column in (
+            (ClickRollupHourly, hourly, "bucket"),
+            (ClickRollupDaily, daily, "bucket"),
+            (ReferrerRollup, referrers, "referrer"),
+        ):
+            rows = [{"key": key, column: value, "clicks": clicks} for (key, value), clicks in sorted(counts.items())]
+            await session.execute(_upsert(session, model, rows, ["key", column]))
+
+
+async def fetch_url_stats(
+    db: AsyncSession, key: str, granularity: StatsGranularity, limit: int, top_referrers: int
+) -> dict:
+    """
+    Build link statistics from the rollup tables only; the raw clicks table is never scanned.
+    """
+    model = ROLLUP_MODELS[granularity]
+    try:
+        total = await db.execute(select(func.coalesce(func.sum(ClickRollupDaily.clicks), 0)).filter(
+            ClickRollupDaily.key == key
+        ))
+        series = await db.execute(
+            select(model.bucket, model.clicks).filter(model.key == key).order_by(model.bucket.desc()).limit(limit)
+        )
+        referrers = await db.execute(
+            select(ReferrerRollup.referrer, ReferrerRollup.clicks)
+            .filter(ReferrerRollup.key == key)
+            .order_by(ReferrerRollup.clicks.desc())
+            .limit(top_referrers)
+        )
+    except SQLAlchemyError as e:
+        logger.error("Error fetching URL stats: %s", e)
+        raise e
+
+    return {
+        "key": key,
+        "total_clicks": total.scalar(),
+        "granularity": granularity.value,
+        "series": [{"bucket": row.bucket, "clicks": row.clicks} for row in reversed(series.all())],
+        "top_referrers": [{"referrer": row.referrer, "clicks": row.clicks} for row in referrers],
+    }
+
+
+click_recorder = ClickRecorder()
+
+registry.register(
+    CallbackMetric(
+        "click_events_total",
+        "Click events by outcome in the buffered click pipeline.",
+        lambda: [
+            ((outcome,), value) for outcome, value in click_recorder.stats().items() if outcome != "queued"
+        ],
+        ["outcome"],
+        "counter",
+    )
+)
+registry.register(
+    CallbackMetric(
+        "click_queue_depth", "Click events waiting to be flushed.", lambda: [((), click_recorder.stats()["queued"])]
+    )
+)
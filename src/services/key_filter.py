@@ -0,0 +1,204 @@
+import asyncio
+import logging.config
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from sqlalchemy import func
+from sqlalchemy.future import select
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.db.db_connector import async_session, shard_sessions
+from src.db.sharding import shard_for_key
+from src.models.models import URL
+from src.core.bloom import BloomFilter
+from src.core.config import settings
+from src.core.metrics import CallbackMetric, Counter, registry
+from src.core.logger import LOGGING
+from src.core.singleflight import SingleFlight
+
+
+logging.config.dictConfig(LOGGING)
+logger = logging.getLogger(__name__)
+
+# created_at is the inserting transaction's start time, so a row can commit after a poll has moved
+# past it; each poll re-reads this much before the newest one seen. Links are created in short
+# transactions, and anything later still is caught by the periodic full rebuild.
+CREATION_OVERLAP = timedelta(seconds=10)
+
+
+class KeyFilter:
+    """
+    Bloom filter of every live short key in the urls table, consulted before a key lookup reaches the
+    database. A key the filter has never seen did not exist at its last poll; a key it has seen
+    probably does.
+
+    The filter is built in the background at startup by streaming all keys, then kept current by
+    `add` for keys created in this process and by polling for rows created since the newest one
+    seen, for keys created by other workers. `sync` polls on demand, for a miss that has to be sure.
+    Until the first build completes every key is let through. When the key count outgrows the
+    capacity the filter is rebuilt at twice the size, and it is rebuilt from scratch every
+    `rebuild_interval` seconds in any case.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable = async_session,
+        capacity: int = settings.key_filter_capacity,
+        error_rate: float = settings.key_filter_error_rate,
+        refresh_interval: float = settings.key_filter_refresh_interval,
+        rebuild_interval: float = settings.key_filter_rebuild_interval,
+    ) -> None:
+        self.session_factory = session_factory
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.refresh_interval = refresh_interval
+        self.rebuild_interval = rebuild_interval
+        # created_at of the newest row seen, or the database's clock when the last build started.
+        self.watermark: Optional[datetime] = None
+        self._built_at = 0.0
+        self._polled_at = 0.0
+        self._bloom: Optional[BloomFilter] = None
+        self._building: Optional[BloomFilter] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._bloom is not None
+
+    def might_contain(self, key: str) -> bool:
+        return self._bloom is None or key in self._bloom
+
+    def add(self, key: str) -> None:
+        for bloom in (self._bloom, self._building):
+            if bloom is not None:
+                bloom.add(key)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def build(self, capacity: Optional[int] = None) -> None:
+        """
+        Stream every key into a fresh filter and swap it in. Keys added while the build runs go
+        into both the old and the new filter.
+        """
+        self._building = BloomFilter(capacity or self.capacity, self.error_rate)
+        try:
+            polled_at = time.monotonic()
+            watermark = await self._load(self._building.add, None)
+            self._bloom, self.capacity = self._building, self._building.capacity
+            self.watermark = watermark
+            self._built_at = self._polled_at = polled_at
+        finally:
+            self._building = None
+        bloom = self._bloom
+        logger.info("Key filter built: %d keys, %d bytes, %d hashes", bloom.count, bloom.size_bytes, bloom.num_hashes)
+
+    async def refresh(self) -> None:
+        if self._bloom.count > self._bloom.capacity:
+            logger.warning("Key filter is over capacity (%d keys), rebuilding", self._bloom.count)
+            await self.build(self._bloom.count * 2)
+            return
+        polled_at = time.monotonic()
+        # Through `add`, so keys found while a rebuild runs land in the new filter too.
+        self.watermark = await self._load(self.add, self.watermark - CREATION_OVERLAP)
+        self._polled_at = polled_at
+
+    async def sync(self, since: float) -> None:
+        """
+        Return once a poll that started at `since` (time.monotonic()) or later has completed, so the
+        filter holds every key committed before then. Concurrent callers share one poll.
+        """
+        while self._polled_at < since:
+            await key_filter_polls.do(self, self.refresh)
+
+    async def _load(self, add: Callable[[str], None], created_after: Optional[datetime]) -> datetime:
+        """
+        Add the keys of live links created after `created_after`, or of all of them. Returns the new
+        watermark: the newest created_at read, never below the database clock of a full load.
+        """
+        stmt = select(URL.key, URL.created_at).filter(URL.is_active == True)
+        if created_after is not None:
+            stmt = stmt.filter(URL.created_at > created_after)
+        async with self.session_factory() as session:
+            watermark = self.watermark
+            if created_after is None:
+                watermark = (await session.execute(select(func.now()))).scalar()
+            result = await session.stream(stmt.execution_options(yield_per=settings.status_stream_chunk_size))
+            async for row in result:
+                add(row.key)
+                if row.created_at is not None and row.created_at > watermark:
+                    watermark = row.created_at
+        return watermark
+
+    async def _run(self) -> None:
+        while not self.ready:
+            try:
+                await self.build()
+            except SQLAlchemyError as e:
+                logger.error("Error building key filter, retrying: %s", e)
+                await asyncio.sleep(self.refresh_interval)
+
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                if time.monotonic() - self._built_at > self.rebuild_interval:
+                    await self.build()
+                else:
+                    await key_filter_polls.do(self, self.refresh)
+            except SQLAlchemyError as e:
+                logger.error("Error refreshing key filter: %s", e)
+
+
+# A poll on behalf of misses also serves the misses arriving while it runs.
+key_filter_polls = SingleFlight("key_filter_poll")
+key_filter = KeyFilter()
+# One filter per urls shard, each loaded from its own database; index 0 is `key_filter`.
+key_filters = [key_filter, *(KeyFilter(session_factory=factory) for factory in shard_sessions[1:])]
+
+
+def key_filter_for(key: str) -> KeyFilter:
+    return key_filters[shard_for_key(key)]
+
+
+def _ready_filters():
+    return [each for each in key_filters if each.ready]
+
+
+key_filter_rejections = registry.register(
+    Counter("key_filter_rejections_total", "Key lookups answered as not found by the key filter.")
+)
+registry.register(
+    CallbackMetric(
+        "key_filter_keys",
+        "Keys added to the short-key Bloom filter.",
+        lambda: [((), sum(each._bloom.count for each in _ready_filters()))] if _ready_filters() else [],
+    )
+)
+registry.register(
+    CallbackMetric(
+        "key_filter_bytes",
+        "Memory held by the short-key Bloom filter's bit array.",
+        lambda: [((), sum(each._bloom.size_bytes for each in _ready_filters()))] if _ready_filters() else [],
+    )
+)
+registry.register(
+    CallbackMetric(
+        "key_filter_false_positive_rate",
+        "Estimated false-positive rate of the short-key Bloom filter at its current fill.",
+        lambda: [((), max(each._bloom.estimated_error_rate() for each in _ready_filters()))]
+        if _ready_filters()
+        else [],
+    )
+)
@@ -0,0 +1,108 @@
+import asyncio
+import logging.config
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.db.db_connector import async_session, shard_count
+from src.services.redirect_snapshot import redirect_snapshot_for
+from src.services.url_services import archive_inactive_urls, deactivate_expired_urls
+from src.core.config import settings
+from src.core.metrics import CallbackMetric, registry
+from src.core.logger import LOGGING
+
+
+logging.config.dictConfig(LOGGING)
+logger = logging.getLogger(__name__)
+
+
+class LinkSweeper:
+    """
+    Background task that every `interval` seconds deactivates links past their expires_at and moves
+    links deactivated more than `archive_after_days` ago into urls_archive, which keeps them out of
+    the urls heap as well as its (partial) indexes.
+
+    Work is done in transactions of at most `batch_size` rows that skip rows locked by anyone else,
+    so a backlog never holds long locks, and several workers sweeping at once split it between them.
+    Each urls shard has its own sweeper; `session_factory` is the primary, where owners are bumped.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable = async_session,
+        interval: float = settings.link_sweep_interval,
+        batch_size: int = settings.link_sweep_batch_size,
+        archive_after_days: int = settings.link_archive_after_days,
+        shard: int = 0,
+    ) -> None:
+        self.session_factory = session_factory
+        self.shard = shard
+        self.interval = interval
+        self.batch_size = batch_size
+        self.archive_after_days = archive_after_days
+        self.expired = 0
+        self.archived = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def sweep(self) -> None:
+        while True:
+            async with self.session_factory() as session:
+                expired = await deactivate_expired_urls(session, self.batch_size, self.shard)
+            if settings.redirect_snapshot_enabled:
+                for key, _ in expired:
+                    redirect_snapshot_for(key).deactivate(key)
+            self.expired += len(expired)
+            if len(expired) < self.batch_size:
+                break
+            # Let request handling in between batches.
+            await asyncio.sleep(0)
+
+        if self.archive_after_days <= 0:
+            return
+        cutoff = datetime.now(timezone.utc) - timedelta(days=self.archive_after_days)
+        while True:
+            async with self.session_factory() as session:
+                archived = await archive_inactive_urls(session, cutoff, self.batch_size, self.shard)
+            self.archived += archived
+            if archived < self.batch_size:
+                break
+            await asyncio.sleep(0)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.sweep()
+            except SQLAlchemyError as e:
+                logger.error("Error sweeping links: %s", e)
+            await asyncio.sleep(self.interval)
+
+
+link_sweepers = [LinkSweeper(shard=shard) for shard in range(shard_count)]
+
+registry.register(
+    CallbackMetric(
+        "link_sweeper_rows_total",
+        "Links deactivated on expiry and moved to the archive by the link sweeper.",
+        lambda: [
+            (("expired",), sum(each.expired for each in link_sweepers)),
+            (("archived",), sum(each.archived for each in link_sweepers)),
+        ],
+        ["action"],
+        "counter",
+    )
+)
@@ -0,0 +1,21 @@
+from datetime import datetime, timezone
+from typing import NamedTuple, Optional
+
+
+class RedirectEntry(NamedTuple):
+    target_url: str
+    type: str
+    user_id: Optional[int]
+    is_active: bool
+    # Unix time, so the redirect path can check it without building datetimes.
+    expires_at: Optional[float] = None
+
+    def expired(self, now: float) -> bool:
+        return self.expires_at is not None and self.expires_at <= now
+
+
+def unix_time(value: Optional[datetime]) -> Optional[float]:
+    if value is None:
+        return None
+    # SQLite hands timestamps back naive; they are stored as UTC.
+    return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).timestamp()
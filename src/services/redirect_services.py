@@ -0,0 +1,123 @@
+import time
+from typing import Callable, NamedTuple, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.db.db_connector import read_session_factory
+from src.services.click_services import click_recorder
+from src.services.redirect_entry import RedirectEntry
+from src.services.redirect_snapshot import redirect_snapshot_for
+from src.services.url_services import get_cached_redirect, load_redirect_by_key
+from src.services.user_services import get_user_by_token
+from src.core.config import settings
+from src.core.http_cache import etag_matches, make_etag
+
+
+REDIRECT_STATUSES = (301, 302, 307, 308)
+PRIVATE_CACHE_CONTROL = "private, no-store"
+
+
+class RedirectResult(NamedTuple):
+    status_code: int
+    location: Optional[str] = None
+    detail: Optional[str] = None
+    cache_status: Optional[str] = None
+    cache_control: Optional[str] = None
+    etag: Optional[str] = None
+
+
+def public_cache_control(expires_at: Optional[float] = None, now: Optional[float] = None) -> str:
+    max_age = settings.public_redirect_max_age
+    if expires_at is not None:
+        # Never let a cache keep redirecting past the link's expiry.
+        max_age = min(max_age, int(expires_at - (now or time.time())))
+    return f"public, max-age={max_age}" if max_age > 0 else "no-cache"
+
+
+def bearer_token(authorization: Optional[str]) -> Optional[str]:
+    return authorization.split(" ")[1] if authorization and authorization.startswith("Bearer ") else None
+
+
+async def resolve_redirect(
+    key: str,
+    token: Optional[str],
+    if_none_match: Optional[str] = None,
+    session_factory: Optional[Callable[[], AsyncSession]] = None,
+) -> RedirectResult:
+    """
+    Decide the response for GET /r/{key}, looking in the shared snapshot (when enabled) and the
+    per-process redirect cache first. A database session is only opened when both miss or a
+    private link needs its token checked against the database; by default it is a read session,
+    routed to a replica unless the token or key was written recently.
+    Public links answer with PUBLIC_REDIRECT_STATUS, a Cache-Control max-age (capped at the link's
+    expiry) and an ETag, and with 304 when `if_none_match` matches; private links always send no-store.
+    Links past their expires_at are not found even before the sweeper has deactivated them.
+    Errors loading the link propagate; a failing token lookup becomes a 503, as in the API routes.
+    """
+    db: Optional[AsyncSession] = None
+    try:
+        url, cache_status = _cached_redirect(key)
+        if url is None:
+            db = (session_factory or read_session_factory(token, key))()
+            url = await load_redirect_by_key(db, key)
+            cache_status = "MISS"
+
+        now = time.time()
+        if not url or not url.is_active or url.expired(now):
+            return RedirectResult(404, detail="URL not found")
+        if url.type != "private":
+            return _public_redirect(url, cache_status, if_none_match, now)
+
+        if not token:
+            return RedirectResult(401, detail="Authorization required for private URLs")
+        if db is None:
+            db = (session_factory or read_session_factory(token, key))()
+        return await _private_redirect(db, url, cache_status, token)
+    finally:
+        if db is not None:
+            await db.close()
+
+
+def _cached_redirect(key: str) -> Tuple[Optional[RedirectEntry], Optional[str]]:
+    """
+    The link from the shared snapshot or the per-process cache, with the X-Cache status to report.
+    """
+    if settings.redirect_snapshot_enabled:
+        url = redirect_snapshot_for(key).get(key)
+        if url is not None:
+            return url, "SHARED"
+    url = get_cached_redirect(key)
+    return url, "HIT" if url is not None else None
+
+
+def _public_redirect(url: RedirectEntry, cache_status: str, if_none_match: Optional[str], now: float) -> RedirectResult:
+    status_code = settings.public_redirect_status
+    # Permanent redirects are cached indefinitely by browsers, so expiring links stay temporary.
+    if status_code not in REDIRECT_STATUSES or (url.expires_at is not None and status_code in (301, 308)):
+        status_code = 307
+    etag = make_etag(status_code, url.target_url)
+    if etag_matches(if_none_match, etag):
+        status_code = 304
+    return RedirectResult(
+        status_code,
+        url.target_url,
+        cache_status=cache_status,
+        cache_control=public_cache_control(url.expires_at, now),
+        etag=etag,
+    )
+
+
+async def _private_redirect(db: AsyncSession, url: RedirectEntry, cache_status: str, token: str) -> RedirectResult:
+    try:
+        user = await get_user_by_token(db, token)
+    except SQLAlchemyError:
+        return RedirectResult(503, detail="Database error occurred")
+    if not user or user.id != url.user_id:
+        return RedirectResult(403, detail="Not authorized to access this URL")
+    return RedirectResult(307, location=url.target_url, cache_status=cache_status, cache_control=PRIVATE_CACHE_CONTROL)
+
+
+def record_click(key: str, user_agent: Optional[str], referrer: Optional[str], client_ip: Optional[str]) -> None:
+    if settings.clicks_enabled:
+        click_recorder.record(key, user_agent=user_agent, referrer=referrer, client_ip=client_ip)
@@ -0,0 +1,432 @@
+import asyncio
+import fcntl
+import hashlib
+import logging.config
+import mmap
+import os
+import struct
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Optional
+
+from sqlalchemy import func
+from sqlalchemy.future import select
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.db.db_connector import async_session, shard_sessions
+from src.db.sharding import shard_for_key
+from src.models.models import URL
+from src.services.key_filter import CREATION_OVERLAP
+from src.services.redirect_entry import RedirectEntry, unix_time
+from src.core.config import settings
+from src.core.metrics import CallbackMetric, registry
+from src.core.logger import LOGGING
+
+
+logging.config.dictConfig(LOGGING)
+logger = logging.getLogger(__name__)
+
+# File layout, little endian:
+#   header  magic, built_at_ns, slot_count, entry_count, heap_size, heap_used, watermark (newest created_at
+#           loaded, unix microseconds), retired
+#   slots   slot_count x (key hash, absolute entry offset; 0 = empty), open addressing with linear probing
+#   heap    entries: user_id (-1 = none), active, type, key length, target length, expires_at (unix time,
+#           0 = never), key bytes, target bytes
+MAGIC = b"URLSNAP2"
+HEADER = struct.Struct("<8sQQQQQQQ")
+SLOT = struct.Struct("<QQ")
+ENTRY = struct.Struct("<qBBHId")
+ENTRY_COUNT_OFFSET, HEAP_USED_OFFSET, WATERMARK_OFFSET, RETIRED_OFFSET = 24, 40, 48, 56
+ACTIVE_OFFSET = 8
+TYPES = ("public", "private")
+FILE_MODE = 0o600
+# Slots are kept at most half full so probe sequences stay short.
+LOAD_FACTOR = 0.5
+# deactivated_at is the deactivating transaction's start time, so it can commit later than a poll
+# that has already moved past it; each poll re-reads this much before the newest one seen.
+DEACTIVATION_OVERLAP = timedelta(seconds=60)
+
+
+def _hash(key: bytes) -> int:
+    # Stable across processes, unlike hash(); never 0 so a zeroed slot reads as empty.
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little") or 1
+
+
+def _slot_count(capacity: int) -> int:
+    return 1 << max(4, (int(capacity / LOAD_FACTOR) - 1).bit_length())
+
+
+class _Table:
+    """
+    One mapped snapshot file. Lookups read straight from the shared mapping.
+    """
+
+    def __init__(self, mm: mmap.mmap) -> None:
+        self.mm = mm
+        magic, _, self.slot_count, _, self.heap_size, _, _, _ = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC:
+            raise ValueError("not a redirect snapshot")
+        self.mask = self.slot_count - 1
+        self.heap_start = HEADER.size + self.slot_count * SLOT.size
+
+    @classmethod
+    def create(cls, path: str, capacity: int, heap_size: int) -> "_Table":
+        slot_count = _slot_count(capacity)
+        # Link targets and owners are private: readable by the app's own user only, whatever the umask.
+        with open(os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, FILE_MODE), "w+b") as file:
+            os.fchmod(file.fileno(), FILE_MODE)
+            # Sparse on tmpfs: pages are only allocated once written.
+            file.truncate(HEADER.size + slot_count * SLOT.size + heap_size)
+            mm = mmap.mmap(file.fileno(), 0)
+        HEADER.pack_into(mm, 0, MAGIC, time.time_ns(), slot_count, 0, heap_size, 0, 0, 0)
+        return cls(mm)
+
+    @classmethod
+    def open(cls, path: str) -> "_Table":
+        with open(path, "r+b") as file:
+            return cls(mmap.mmap(file.fileno(), 0))
+
+    def header(self) -> tuple:
+        return HEADER.unpack_from(self.mm, 0)
+
+    @property
+    def retired(self) -> bool:
+        return self.mm[RETIRED_OFFSET] != 0
+
+    def retire(self) -> None:
+        self.mm[RETIRED_OFFSET] = 1
+
+    def find(self, key: bytes) -> int:
+        """
+        Absolute offset of the key's entry, or 0. Entries are verified against the key, so a slot
+        being published concurrently reads as a miss rather than a wrong answer.
+        """
+        mm = self.mm
+        key_hash = _hash(key)
+        index = key_hash & self.mask
+        for _ in range(self.slot_count):
+            slot_hash, offset = SLOT.unpack_from(mm, HEADER.size + index * SLOT.size)
+            if offset == 0:
+                return 0
+            if slot_hash == key_hash and self.heap_start <= offset < len(mm) - ENTRY.size:
+                key_length = ENTRY.unpack_from(mm, offset)[3]
+                start = offset + ENTRY.size
+                if mm[start:start + key_length] == key:
+                    return offset
+            index = (index + 1) & self.mask
+        return 0
+
+    def entry(self, offset: int) -> RedirectEntry:
+        user_id, active, url_type, key_length, target_length, expires_at = ENTRY.unpack_from(self.mm, offset)
+        start = offset + ENTRY.size + key_length
+        return RedirectEntry(
+            target_url=self.mm[start:start + target_length].decode(),
+            type=TYPES[url_type],
+            user_id=None if user_id < 0 else user_id,
+            is_active=bool(active),
+            expires_at=expires_at or None,
+        )
+
+    def insert(
+        self, key: bytes, target: bytes, url_type: str, user_id: Optional[int], expires_at: Optional[float] = None
+    ) -> bool:
+        """
+        Append an entry and publish it in its slot; only the leader calls this. Returns False when
+        the table is full and has to be rebuilt larger.
+        """
+        _, _, _, entry_count, _, heap_used, _, _ = self.header()
+        size = ENTRY.size + len(key) + len(target)
+        if entry_count + 1 > self.slot_count * LOAD_FACTOR or heap_used + size > self.heap_size:
+            return False
+        if self.find(key):
+            return True
+
+        offset = self.heap_start + heap_used
+        user_id = -1 if user_id is None else user_id
+        ENTRY.pack_into(self.mm, offset, user_id, 1, TYPES.index(url_type), len(key), len(target), expires_at or 0.0)
+        self.mm[offset + ENTRY.size:offset + size] = key + target
+
+        key_hash = _hash(key)
+        index = key_hash & self.mask
+        while SLOT.unpack_from(self.mm, HEADER.size + index * SLOT.size)[1] != 0:
+            index = (index + 1) & self.mask
+        SLOT.pack_into(self.mm, HEADER.size + index * SLOT.size, key_hash, offset)
+        struct.pack_into("<Q", self.mm, ENTRY_COUNT_OFFSET, entry_count + 1)
+        struct.pack_into("<Q", self.mm, HEAP_USED_OFFSET, heap_used + size)
+        return True
+
+    def set_watermark(self, watermark: int) -> None:
+        struct.pack_into("<Q", self.mm, WATERMARK_OFFSET, watermark)
+
+    def deactivate(self, key: bytes) -> bool:
+        offset = self.find(key)
+        if offset:
+            # A single byte, so readers in other processes never see it half written.
+            self.mm[offset + ACTIVE_OFFSET] = 0
+        return bool(offset)
+
+    def inactive_keys(self):
+        """
+        Keys deactivated in place, walking the heap in insertion order.
+        """
+        heap_used = self.header()[5]
+        offset = self.heap_start
+        while offset < self.heap_start + heap_used:
+            _, active, _, key_length, target_length, _ = ENTRY.unpack_from(self.mm, offset)
+            if not active:
+                yield bytes(self.mm[offset + ENTRY.size:offset + ENTRY.size + key_length])
+            offset += ENTRY.size + key_length + target_length
+
+    def close(self) -> None:
+        self.mm.close()
+
+
+class RedirectSnapshot:
+    """
+    Active links shared by every worker on a host through a memory-mapped file (REDIRECT_SNAPSHOT_PATH,
+    under /dev/shm by default), so memory use does not grow with the number of workers and a new
+    worker serves known keys from its first request.
+
+    One worker, whichever holds the lock file, is the leader: it builds the file from the urls
+    table, appends links created since (polling by created_at like the key filter) and
+    periodically rebuilds it into a new file that replaces the old one. Any worker deactivating a
+    link clears its active byte in place, so deactivations are visible to all workers at once; the
+    leader also polls for links deactivated since its last poll, which covers other hosts and
+    anything that bypassed the service layer. Readers switch to a replacement file as soon as the
+    old one is marked retired.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable = async_session,
+        path: str = settings.redirect_snapshot_path,
+        capacity: int = settings.redirect_snapshot_capacity,
+        refresh_interval: float = settings.redirect_snapshot_refresh_interval,
+        rebuild_interval: float = settings.redirect_snapshot_rebuild_interval,
+    ) -> None:
+        self.session_factory = session_factory
+        self.path = path
+        self.capacity = capacity
+        self.refresh_interval = refresh_interval
+        self.rebuild_interval = rebuild_interval
+        self.hits = 0
+        self.misses = 0
+        self.leader = False
+        self._table: Optional[_Table] = None
+        self._lock_fd: Optional[int] = None
+        self._built_at = 0.0
+        self._deactivated_at: Any = None
+        self._created_at: Optional[datetime] = None
+        self._full = False
+        self._task: Optional[asyncio.Task] = None
+
+    def get(self, key: str) -> Optional[RedirectEntry]:
+        table = self._current()
+        if table is None:
+            return None
+        offset = table.find(key.encode())
+        if not offset:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return table.entry(offset)
+
+    def deactivate(self, key: str) -> None:
+        table = self._current()
+        if table is None:
+            return
+        table.deactivate(key.encode())
+        # The leader may have swapped in a rebuilt file meanwhile; mark it there as well.
+        if table.retired:
+            table = self._current()
+            if table is not None:
+                table.deactivate(key.encode())
+
+    def entries(self) -> int:
+        table = self._current()
+        return table.header()[3] if table is not None else 0
+
+    def _current(self) -> Optional[_Table]:
+        if self._table is not None and self._table.retired:
+            self._remap()
+        return self._table
+
+    def _remap(self) -> None:
+        try:
+            table = _Table.open(self.path)
+        except (OSError, ValueError):
+            return
+        if self._table is not None:
+            self._table.close()
+        self._table = table
+
+    def _try_lead(self) -> bool:
+        if self._lock_fd is None:
+            self._lock_fd = os.open(f"{self.path}.lock", os.O_RDWR | os.O_CREAT, FILE_MODE)
+        try:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        self.leader = True
+        logger.info("Redirect snapshot leader: pid %d", os.getpid())
+        return True
+
+    async def rebuild(self) -> None:
+        text_length = func.coalesce(func.sum(func.length(URL.key) + func.length(URL.target_url)), 0)
+        async with self.session_factory() as session:
+            result = await session.execute(
+                select(func.count(URL.id), text_length, func.now()).filter(URL.is_active == True)
+            )
+            count, text_bytes, now = result.one()
+            # Links deactivated from here on may still be read as active by the load below.
+            deactivated_at = (await session.execute(select(func.max(URL.deactivated_at)))).scalar()
+
+        capacity = max(self.capacity, count * 2)
+        # Sparse, so the generous heap costs nothing until written.
+        heap_size = max(capacity * 256, 4 * (count * ENTRY.size + text_bytes))
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        table = _Table.create(tmp_path, capacity, heap_size)
+        try:
+            watermark = await self._load(table, None, now)
+        except BaseException:
+            table.close()
+            os.unlink(tmp_path)
+            raise
+
+        os.replace(tmp_path, self.path)
+        old, self._table = self._table, table
+        if old is not None:
+            old.retire()
+            # Deactivations made by other workers in the old file while this one was being built.
+            for key in old.inactive_keys():
+                table.deactivate(key)
+            old.close()
+
+        self.capacity, self._full, self._built_at = capacity, watermark is None, time.monotonic()
+        self._created_at = watermark or now
+        self._deactivated_at = deactivated_at
+        await self._load_deactivations(table)
+        logger.info("Redirect snapshot rebuilt: %d links, created up to %s", table.header()[3], self._created_at)
+
+    async def refresh(self) -> None:
+        table = self._table
+        # Re-read a window below the watermark for rows that committed late, as in the key filter. A
+        # leader that took over without a rebuild has no watermark and reads every link once.
+        created_after = None if self._created_at is None else self._created_at - CREATION_OVERLAP
+        watermark = await self._load(table, created_after, self._created_at)
+        self._full = watermark is None
+        self._created_at = watermark or self._created_at
+        await self._load_deactivations(table)
+
+    async def _load_deactivations(self, table: _Table) -> None:
+        """
+        Clear the active byte of links deactivated since the last poll. A leader that took over
+        without a rebuild has no last poll and reads every deactivated link once.
+        """
+        stmt = select(URL.key, URL.deactivated_at).filter(URL.is_active == False)
+        if self._deactivated_at is not None:
+            stmt = stmt.filter(URL.deactivated_at > self._deactivated_at - DEACTIVATION_OVERLAP)
+        async with self.session_factory() as session:
+            result = await session.stream(stmt.execution_options(yield_per=settings.status_stream_chunk_size))
+            async for row in result:
+                table.deactivate(row.key.encode())
+                if row.deactivated_at is not None and (
+                    self._deactivated_at is None or row.deactivated_at > self._deactivated_at
+                ):
+                    self._deactivated_at = row.deactivated_at
+
+    async def _load(
+        self, table: _Table, created_after: Optional[datetime], watermark: Optional[datetime]
+    ) -> Optional[datetime]:
+        """
+        Insert active links created after `created_after`, or all of them. Returns the newest
+        created_at read, at least `watermark`, or None if the table ran out of room.
+        """
+        stmt = select(URL.key, URL.target_url, URL.type, URL.user_id, URL.expires_at, URL.created_at).filter(
+            URL.is_active == True
+        )
+        if created_after is not None:
+            stmt = stmt.filter(URL.created_at > created_after)
+        async with self.session_factory() as session:
+            result = await session.stream(stmt.execution_options(yield_per=settings.status_stream_chunk_size))
+            async for row in result:
+                expires_at = unix_time(row.expires_at)
+                if not table.insert(row.key.encode(), row.target_url.encode(), row.type, row.user_id, expires_at):
+                    return None
+                if row.created_at is not None and (watermark is None or row.created_at > watermark):
+                    watermark = row.created_at
+        if watermark is not None:
+            table.set_watermark(int(unix_time(watermark) * 1_000_000))
+        return watermark
+
+    def start(self) -> None:
+        if os.path.exists(self.path):
+            self._remap()
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+            self.leader = False
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if self.leader or self._try_lead():
+                    if self._full or time.monotonic() - self._built_at > self.rebuild_interval:
+                        if self._full:
+                            self.capacity *= 2
+                        await self.rebuild()
+                    else:
+                        await self.refresh()
+                elif self._table is None:
+                    self._remap()
+            except (OSError, SQLAlchemyError) as e:
+                logger.error("Error maintaining redirect snapshot: %s", e)
+            await asyncio.sleep(self.refresh_interval)
+
+
+redirect_snapshot = RedirectSnapshot()
+# One file per urls shard, each built from its own database; index 0 is `redirect_snapshot`.
+redirect_snapshots = [
+    redirect_snapshot,
+    *(
+        RedirectSnapshot(session_factory=factory, path=f"{settings.redirect_snapshot_path}.{shard}")
+        for shard, factory in enumerate(shard_sessions)
+        if shard > 0
+    ),
+]
+
+
+def redirect_snapshot_for(key: str) -> RedirectSnapshot:
+    return redirect_snapshots[shard_for_key(key)]
+
+
+registry.register(
+    CallbackMetric(
+        "redirect_snapshot_lookups_total",
+        "Shared redirect snapshot lookups by result.",
+        lambda: [
+            (("hit",), sum(each.hits for each in redirect_snapshots)),
+            (("miss",), sum(each.misses for each in redirect_snapshots)),
+        ],
+        ["result"],
+        "counter",
+    )
+)
+registry.register(
+    CallbackMetric(
+        "redirect_snapshot_entries",
+        "Links held in the shared redirect snapshot.",
+        lambda: [((), sum(each.entries() for each in redirect_snapshots))],
+    )
+)
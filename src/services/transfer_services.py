@@ -0,0 +1,233 @@
+import codecs
+import csv
+import io
+import json
+import logging.config
+import re
+from typing import Any, AsyncIterator, Callable, List, Optional, Tuple
+
+import validators
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.services.url_services import EXPORT_COLUMNS, copy_db_urls_bulk, stream_links_export
+from src.models.schemas import URLBase, URLType
+from src.core.config import settings
+from src.core.logger import LOGGING
+
+
+logging.config.dictConfig(LOGGING)
+logger = logging.getLogger(__name__)
+
+TRANSFER_FORMATS = ("csv", "ndjson")
+MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+# HttpUrl's length limit.
+MAX_URL_LENGTH = 2083
+URL_TYPES = {url_type.value for url_type in URLType}
+TARGET_URL_FIELD = URLBase.__fields__["target_url"]
+# URLs that both of the API's checks accept, written out as one pattern so the common row costs a
+# single match: http(s), a dotted ASCII host with an alphabetic TLD, an optional port below 10000,
+# and a path, query and fragment made of characters either check allows there.
+# Anything else (IP hosts, user info, unicode, odd queries) gets the API's checks themselves.
+PLAIN_URL = re.compile(
+    r"https?://(?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+[a-z]{2,63}(?::[1-9][0-9]{0,3})?"
+    r"(?:/[\w.~!$&'()*+,;=:@%/-]*)?"
+    r"(?:\?\w[\w.~!$&'()*+,;=:%/?-]*)?"
+    r"(?:#[\w.~!$&'()*+,;=:%-]*)?",
+    re.IGNORECASE | re.ASCII,
+)
+
+
+def validate_target_url(target_url: str) -> Optional[str]:
+    """
+    The checks the API applies to target_url: URLBase's HttpUrl field, then `validators.url`.
+    Rows matching PLAIN_URL pass both and skip them; the rest are run through the field alone,
+    since building the whole model per row would dominate an import's CPU time.
+    Returns the error.
+    """
+    if len(target_url) > MAX_URL_LENGTH:
+        return "URL is too long"
+    if PLAIN_URL.fullmatch(target_url):
+        return None
+    _, errors = TARGET_URL_FIELD.validate(target_url, {}, loc="target_url")
+    if errors is not None or not validators.url(target_url):
+        return "Invalid URL provided"
+    return None
+
+
+class _RowParser:
+    """
+    Turns one line of an upload into a (target_url, type) row or raises ValueError with the reason.
+    CSV uploads start with a header naming at least a `target_url` column; other columns, such as
+    those of an export, are ignored.
+    """
+
+    def __init__(self, format: str) -> None:
+        self.format = format
+        self.columns: Optional[Tuple[int, Optional[int]]] = None
+
+    def parse(self, line: str) -> Optional[Tuple[str, str]]:
+        if self.format == "ndjson":
+            row = self._decode_ndjson(line)
+        elif self.columns is None:
+            self._read_header(line)
+            return None
+        else:
+            row = self._decode_csv(line)
+
+        target_url, url_type = row
+        if not isinstance(target_url, str) or not target_url.strip():
+            raise ValueError("Missing target_url")
+        # HttpUrl strips surrounding whitespace before the API checks and stores the URL.
+        target_url = target_url.strip()
+        if url_type not in URL_TYPES:
+            raise ValueError(f"Invalid type: {url_type}")
+        error = validate_target_url(target_url)
+        if error is not None:
+            raise ValueError(error)
+        return target_url, url_type
+
+    @staticmethod
+    def _decode_ndjson(line: str) -> Tuple[Any, Any]:
+        try:
+            item = json.loads(line)
+        except ValueError:
+            raise ValueError("Invalid JSON")
+        if not isinstance(item, dict):
+            raise ValueError("Expected a JSON object")
+        return item.get("target_url"), item.get("type") or URLType.public.value
+
+    @staticmethod
+    def _split_csv(line: str) -> List[str]:
+        # Only quoted fields need the csv module.
+        return next(csv.reader([line])) if '"' in line else line.split(",")
+
+    def _read_header(self, line: str) -> None:
+        fields = self._split_csv(line)
+        if "target_url" not in fields:
+            raise ValueError("CSV header must name a target_url column")
+        self.columns = (fields.index("target_url"), fields.index("type") if "type" in fields else None)
+
+    def _decode_csv(self, line: str) -> Tuple[str, str]:
+        fields = self._split_csv(line)
+        url_index, type_index = self.columns
+        if url_index >= len(fields):
+            raise ValueError("Missing target_url")
+        url_type = fields[type_index] if type_index is not None and type_index < len(fields) else ""
+        return fields[url_index], url_type or URLType.public.value
+
+
+async def _line_batches(chunks: AsyncIterator[bytes]) -> AsyncIterator[List[str]]:
+    # Lines are handed on per received chunk; only a trailing partial line is carried over.
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    partial = ""
+    async for chunk in chunks:
+        lines = (partial + decoder.decode(chunk)).split("\n")
+        partial = lines.pop()
+        if lines:
+            yield lines
+    partial += decoder.decode(b"", final=True)
+    if partial:
+        yield [partial]
+
+
+class _Import:
+    """
+    State of one running import: the report so far and the rows of the chunk not yet loaded.
+    """
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        format: str,
+        user_id: Optional[int],
+        on_progress: Optional[Callable[[dict], None]],
+    ) -> None:
+        self.db = db
+        self.parser = _RowParser(format)
+        self.user_id = user_id
+        self.on_progress = on_progress
+        self.report = {"rows": 0, "imported": 0, "rejected": 0, "errors": []}
+        self.line_numbers: List[int] = []
+        self.rows: List[Tuple[str, str]] = []
+
+    def reject(self, line_number: int, error: str) -> None:
+        self.report["rejected"] += 1
+        if len(self.report["errors"]) < settings.import_max_reported_errors:
+            self.report["errors"].append({"line": line_number, "error": error})
+
+    def add(self, line_number: int, line: str) -> None:
+        if not line.strip():
+            return
+        try:
+            row = self.parser.parse(line.rstrip("\r"))
+        except ValueError as e:
+            self.report["rows"] += 1
+            self.reject(line_number, str(e))
+            return
+        if row is None:
+            return
+        self.report["rows"] += 1
+        self.line_numbers.append(line_number)
+        self.rows.append(row)
+
+    async def flush(self) -> None:
+        if not self.rows:
+            return
+        keys = await copy_db_urls_bulk(self.db, self.rows, self.user_id)
+        for line_number, key in zip(self.line_numbers, keys):
+            if key is None:
+                self.reject(line_number, "Could not allocate a unique key")
+            else:
+                self.report["imported"] += 1
+        self.line_numbers.clear()
+        self.rows.clear()
+        logger.info("Import progress: %d rows read, %d imported, %d rejected", *_progress(self.report))
+        if self.on_progress is not None:
+            self.on_progress(self.report)
+
+
+async def import_links(
+    db: AsyncSession,
+    chunks: AsyncIterator[bytes],
+    format: str,
+    user_id: Optional[int] = None,
+    on_progress: Optional[Callable[[dict], None]] = None,
+) -> dict:
+    """
+    Import a CSV or NDJSON upload in `transfer_chunk_size` row chunks, each validated, given keys,
+    loaded with `copy_db_urls_bulk` and committed, so memory stays flat however large the upload is.
+    A failure leaves the chunks before it imported. Rejected rows are reported by line number, the
+    first `import_max_reported_errors` of them in detail.
+    """
+    upload = _Import(db, format, user_id, on_progress)
+    line_number = 0
+    async for lines in _line_batches(chunks):
+        for line in lines:
+            line_number += 1
+            upload.add(line_number, line)
+            if len(upload.rows) >= settings.transfer_chunk_size:
+                await upload.flush()
+    await upload.flush()
+
+    logger.info("Import finished: %d rows read, %d imported, %d rejected", *_progress(upload.report))
+    return upload.report
+
+
+def _progress(report: dict) -> Tuple[int, int, int]:
+    return report["rows"], report["imported"], report["rejected"]
+
+
+async def export_links(db: AsyncSession, format: str, user_id: Optional[int] = None) -> AsyncIterator[str]:
+    """
+    Stream links as CSV (with a header row) or NDJSON, one chunk of rows per yielded string. A CSV
+    export can be imported again as is.
+    """
+    if format == "csv":
+        yield ",".join(EXPORT_COLUMNS) + "\n"
+    async for rows in stream_links_export(db, user_id):
+        if format == "csv":
+            buffer = io.StringIO()
+            csv.writer(buffer, lineterminator="\n").writerows(rows)
+            yield buffer.getvalue()
+        else:
+            yield "".join(json.dumps(dict(zip(EXPORT_COLUMNS, row))) + "\n" for row in rows)
@@ -1,14 +1,30 @@
+import asyncio
+import hashlib
+import heapq
 import logging.config
-from typing import Optional, List
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Optional, List, Set, Tuple
 
+from sqlalchemy import DateTime, String, cast, column, delete, func, insert, literal, or_, table, text, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import IntegrityError, NoResultFound, SQLAlchemyError
 
 from src.db import keygen
-from src.models.models import URL
+from src.db.db_connector import fetch_first, shard_count, shard_session
+from src.db.sharding import decode_cursor, encode_cursor, shard_for_key, shard_key, shard_picker, sharded
+from src.models.models import URL, ClickRollupDaily, URLArchive, User
 from src.models.schemas import URLBase
+from src.services.key_filter import key_filter_for, key_filter_rejections
+from src.services.redirect_entry import RedirectEntry, unix_time
+from src.services.redirect_snapshot import redirect_snapshot_for
+from src.core.cache import TTLCache
 from src.core.config import settings
+from src.core.singleflight import SingleFlight
+from src.core.metrics import registry
 from src.core.logger import LOGGING
 
 
@@ -16,64 +32,744 @@ logging.config.dictConfig(LOGGING)
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class LinkRecord:
+    """
+    One link of a status listing, shaped like LinkResponse. orjson serializes slotted dataclasses
+    natively, so a listing goes from rows to JSON with no dicts or pydantic models in between.
+    """
+
+    __slots__ = ("key", "short_url", "original_url", "type", "expires_at")
+    key: str
+    short_url: str
+    original_url: str
+    type: str
+    expires_at: Optional[datetime]
+
+
+# Invalidated on delete only in the worker handling it; see REDIRECT_CACHE_TTL for the bound.
+redirect_cache = registry.track_cache(
+    TTLCache("redirect", maxsize=settings.redirect_cache_size, ttl=settings.redirect_cache_ttl)
+)
+# Keys found missing, by the database or by the key filter after a poll, kept briefly so repeated
+# lookups of the same junk key skip both.
+missing_key_cache = registry.track_cache(
+    TTLCache(
+        "redirect_negative", maxsize=settings.redirect_negative_cache_size, ttl=settings.redirect_negative_cache_ttl
+    )
+)
+
+
+# Concurrent cache misses for one key (a viral link after a cold start or expiry) share one query.
+key_lookups = SingleFlight("url_key")
+
+
+def _remember_created_key(key: str) -> None:
+    key_filter_for(key).add(key)
+    missing_key_cache.invalidate(key)
+
+
+async def is_known_missing(key: str) -> bool:
+    """
+    True when the key certainly or very recently did not exist, so the database need not be asked.
+    """
+    if missing_key_cache.get(key) is not None:
+        return True
+    key_filter = key_filter_for(key)
+    if key_filter.might_contain(key):
+        return False
+    # The filter lacks keys other workers (or the transfer CLI) created since its last poll; its "no"
+    # counts once a poll started after this lookup has run. Misses arriving meanwhile share that poll.
+    try:
+        await key_filter.sync(time.monotonic())
+    except SQLAlchemyError as e:
+        logger.error("Error polling key filter: %s", e)
+        return False
+    if key_filter.might_contain(key):
+        return False
+    key_filter_rejections.inc()
+    missing_key_cache.set(key, True)
+    return True
+
+
+def target_digest(target_url: str) -> bytes:
+    """
+    Fixed-width digest of a target URL for urls.target_digest. MD5, so that PostgreSQL computes the
+    same value with `_sql_target_digest` in set-based statements and migrations.
+    """
+    return hashlib.md5(target_url.encode(), usedforsecurity=False).digest()
+
+
+def _sql_target_digest(target_url):
+    return func.decode(func.md5(target_url), "hex")
+
+
+def _bump_links_version(user_id: int):
+    return update(User).where(User.id == user_id).values(links_version=User.links_version + 1)
+
+
+def _writable_ctes(db: AsyncSession) -> bool:
+    # Data-modifying WITH clauses are PostgreSQL-only; elsewhere the version bump is its own statement.
+    return db.get_bind().dialect.name == "postgresql"
+
+
+async def _bump_links_versions(db: AsyncSession, links_db: AsyncSession, user_ids: Set[int]) -> None:
+    """
+    Bump links_version for `user_ids` on the primary and commit there. When the links live on the
+    primary too this is the same transaction; on another shard it follows the shard's commit, as
+    users never leave the primary.
+    """
+    if user_ids:
+        await db.execute(
+            update(User)
+            .where(User.id.in_(user_ids))
+            .values(links_version=User.links_version + 1)
+            .execution_options(synchronize_session=False)
+        )
+    if links_db is not db:
+        await links_db.commit()
+    await db.commit()
+
+
 async def create_db_url(db: AsyncSession, url: URLBase, user_id: Optional[int] = None) -> URL:
-    key = keygen.create_random_key()
-    short_url = f"{settings.base_url}/{key}"
+    """
+    Create a link on the shard picked by DB_SHARD_POLICY. `db` is a primary session; key blocks are
+    always leased from the primary so that keys never repeat across shards.
+    """
+    shard = shard_picker.pick(user_id)
+    async with shard_session(db, shard) as links_db:
+        return await _create_db_url(db, links_db, shard, url, user_id)
+
 
-    db_url = URL(
-        target_url=url.target_url, key=key, short_url=short_url, is_active=True, user_id=user_id, type=url.type
+async def _create_db_url(
+    db: AsyncSession, links_db: AsyncSession, shard: int, url: URLBase, user_id: Optional[int]
+) -> URL:
+    allocator = keygen.key_allocator
+    for attempt in range(allocator.max_retries + 1):
+        (key,) = await allocator.allocate(db)
+        key = shard_key(shard, key)
+        short_url = f"{settings.base_url}/{key}"
+
+        # INSERT ... RETURNING hands back the stored row, so no refresh SELECT is needed.
+        stmt = (
+            insert(URL)
+            .values(
+                target_url=url.target_url,
+                target_digest=target_digest(url.target_url),
+                key=key,
+                short_url=short_url,
+                is_active=True,
+                user_id=user_id,
+                type=url.type,
+                expires_at=url.expires_at,
+            )
+            .returning(URL)
+        )
+        try:
+            if user_id is not None and links_db is db and _writable_ctes(db):
+                stmt = stmt.add_cte(_bump_links_version(user_id).returning(User.id).cte("bump_links_version"))
+                db_url = (await db.execute(stmt)).scalar_one()
+                await db.commit()
+            else:
+                db_url = (await links_db.execute(stmt)).scalar_one()
+                await _bump_links_versions(db, links_db, {user_id} if user_id is not None else set())
+            _remember_created_key(key)
+            break
+        except (IntegrityError, NoResultFound) as e:
+            # Taken by another link, or skipped by the database as the key of an archived one.
+            await links_db.rollback()
+            if attempt == allocator.max_retries:
+                logger.error("Error creating URL, no free key after %d attempts: %s", attempt + 1, e)
+                raise e
+            logger.warning("Key collision on %s, retrying", key)
+        except SQLAlchemyError as e:
+            await links_db.rollback()
+            await db.rollback()
+            logger.error("Error creating URL: %s", e)
+            raise e
+    logger.info("URL has been successfully created: %s", key)
+    return db_url
+
+
+async def find_db_url_by_target(db: AsyncSession, url: URLBase, user_id: int) -> Optional[URL]:
+    """
+    The user's oldest live, unexpired link to the same target with the same type, for idempotent
+    creation. Looked up by target_digest; target_url is compared too, so a digest collision never
+    hands out someone else's target.
+    """
+    stmt = (
+        select(URL)
+        .filter(
+            URL.user_id == user_id,
+            URL.type == url.type,
+            URL.target_digest == target_digest(url.target_url),
+            URL.target_url == url.target_url,
+            URL.is_active == True,
+            or_(URL.expires_at.is_(None), URL.expires_at > datetime.now(timezone.utc)),
+        )
+        .order_by(URL.id)
+        .limit(1)
     )
 
+    async def find_on_shard(shard: int) -> Optional[URL]:
+        async with shard_session(db, shard) as links_db:
+            return (await links_db.execute(stmt)).scalar_one_or_none()
+
     try:
-        db.add(db_url)
-        await db.commit()
-        await db.refresh(db_url)
+        found = await asyncio.gather(*(find_on_shard(shard) for shard in shard_picker.shards_for_user(user_id)))
     except SQLAlchemyError as e:
-        await db.rollback()
-        logger.error("Error creating URL: %s", e)
+        logger.error("Error fetching URL by target: %s", e)
         raise e
-    logger.info("URL has been successfully created: %s", db_url)
-    return db_url
+    return next((each for each in found if each is not None), None)
+
+
+async def _insert_url_rows(db: AsyncSession, rows: List[dict]) -> Set[str]:
+    """
+    Insert urls rows on the SQLite backends with one executemany, skipping rows whose key is taken.
+    Returns the keys inserted.
+    """
+    stmt = (
+        sqlite.insert(URL.__table__)
+        .on_conflict_do_nothing(index_elements=["key"])
+        .returning(URL.key)
+    )
+    return set((await db.execute(stmt, rows)).scalars().all())
+
+
+async def _insert_urls(db: AsyncSession, keys: List[str], urls: List[URLBase], user_id: Optional[int]) -> Set[str]:
+    if db.get_bind().dialect.name == "postgresql":
+        return set((await db.execute(_bulk_insert_urls_stmt(keys, urls, user_id))).scalars().all())
+    return await _insert_url_rows(
+        db,
+        [
+            {
+                "key": key,
+                "target_url": str(url.target_url),
+                "target_digest": target_digest(url.target_url),
+                "short_url": f"{settings.base_url}/{key}",
+                "is_active": True,
+                "user_id": user_id,
+                "type": url.type.value,
+                "expires_at": url.expires_at,
+            }
+            for key, url in zip(keys, urls)
+        ],
+    )
+
+
+def _bulk_insert_urls_stmt(keys: List[str], urls: List[URLBase], user_id: Optional[int]):
+    """
+    A single INSERT ... SELECT FROM unnest(...) statement for the whole batch. Five array
+    parameters keep it well below the bind-parameter limit regardless of batch size.
+    """
+    rows = (
+        func.unnest(
+            cast(keys, postgresql.ARRAY(String)),
+            cast([str(url.target_url) for url in urls], postgresql.ARRAY(String)),
+            cast([f"{settings.base_url}/{key}" for key in keys], postgresql.ARRAY(String)),
+            cast([url.type.value for url in urls], postgresql.ARRAY(String)),
+            cast([url.expires_at for url in urls], postgresql.ARRAY(DateTime(timezone=True))),
+        )
+        .table_valued("key", "target_url", "short_url", "type", "expires_at")
+        .render_derived()
+    )
+    return (
+        postgresql.insert(URL)
+        .from_select(
+            ["key", "target_url", "target_digest", "short_url", "is_active", "user_id", "type", "expires_at"],
+            select(
+                rows.c.key,
+                rows.c.target_url,
+                _sql_target_digest(rows.c.target_url),
+                rows.c.short_url,
+                literal(True),
+                literal(user_id),
+                cast(rows.c.type, URL.type.type),
+                rows.c.expires_at,
+            ),
+        )
+        .on_conflict_do_nothing(index_elements=["key"])
+        .returning(URL.key)
+    )
+
+
+async def create_db_urls_bulk(
+    db: AsyncSession, urls: List[URLBase], user_id: Optional[int] = None
+) -> List[Optional[str]]:
+    """
+    Insert a batch of URLs, all on one shard, in one statement and commit once. Rows whose generated
+    key collided with an existing one are retried with fresh keys, up to the allocator's `max_retries`
+    extra rounds. Returns the assigned key per input position, or None when no free key was found.
+    """
+    assigned: List[Optional[str]] = [None] * len(urls)
+    pending = list(range(len(urls)))
+    shard = shard_picker.pick(user_id)
+
+    async with shard_session(db, shard) as links_db:
+        try:
+            for _ in range(keygen.key_allocator.max_retries + 1):
+                if not pending:
+                    break
+                keys = [shard_key(shard, key) for key in await keygen.key_allocator.allocate(db, len(pending))]
+                inserted = await _insert_urls(links_db, keys, [urls[i] for i in pending], user_id)
+
+                retry = []
+                for position, key in zip(pending, keys):
+                    if key in inserted:
+                        assigned[position] = key
+                    else:
+                        retry.append(position)
+                pending = retry
+            created = user_id is not None and len(pending) < len(urls)
+            await _bump_links_versions(db, links_db, {user_id} if created else set())
+        except SQLAlchemyError as e:
+            await links_db.rollback()
+            await db.rollback()
+            logger.error("Error creating URLs in bulk: %s", e)
+            raise e
+
+    for key in assigned:
+        if key is not None:
+            _remember_created_key(key)
+
+    logger.info("%d of %d URLs have been successfully created in bulk", len(urls) - len(pending), len(urls))
+    return assigned
+
+
+IMPORT_STAGING_COLUMNS = ("key", "target_url", "short_url", "type")
+# Session-local and emptied on commit, so concurrent imports never see each other's rows.
+import_staging = table("url_import", *(column(name) for name in IMPORT_STAGING_COLUMNS))
+CREATE_IMPORT_STAGING = text(
+    "CREATE TEMPORARY TABLE IF NOT EXISTS url_import "
+    "(key text, target_url text, short_url text, type text) ON COMMIT DELETE ROWS"
+)
+
+
+def _insert_from_staging_stmt(user_id: Optional[int]):
+    return (
+        postgresql.insert(URL)
+        .from_select(
+            ["key", "target_url", "target_digest", "short_url", "is_active", "user_id", "type"],
+            select(
+                import_staging.c.key,
+                import_staging.c.target_url,
+                _sql_target_digest(import_staging.c.target_url),
+                import_staging.c.short_url,
+                literal(True),
+                literal(user_id),
+                cast(import_staging.c.type, URL.type.type),
+            ),
+        )
+        .on_conflict_do_nothing(index_elements=["key"])
+        .returning(URL.key)
+    )
+
+
+async def _load_chunk(db: AsyncSession, records: List[Tuple[str, str, str, str]], user_id: Optional[int]) -> Set[str]:
+    if db.get_bind().dialect.name != "postgresql":
+        # No COPY on SQLite; a single executemany INSERT does the same job there.
+        return await _insert_url_rows(
+            db,
+            [
+                dict(
+                    zip(IMPORT_STAGING_COLUMNS, record),
+                    target_digest=target_digest(record[1]),
+                    is_active=True,
+                    user_id=user_id,
+                )
+                for record in records
+            ],
+        )
+
+    await db.execute(CREATE_IMPORT_STAGING)
+    await db.execute(import_staging.delete())
+    connection = await (await db.connection()).get_raw_connection()
+    await connection.driver_connection.copy_records_to_table(
+        "url_import", records=records, columns=IMPORT_STAGING_COLUMNS
+    )
+    result = await db.execute(_insert_from_staging_stmt(user_id))
+    return set(result.scalars().all())
+
+
+async def copy_db_urls_bulk(
+    db: AsyncSession, rows: List[Tuple[str, str]], user_id: Optional[int] = None
+) -> List[Optional[str]]:
+    """
+    Load a chunk of already validated (target_url, type) rows: COPY into a staging table, then one
+    INSERT ... SELECT from it, committing once. Colliding keys are retried with fresh ones like
+    `create_db_urls_bulk`. Returns the assigned key per input position, or None.
+    """
+    assigned: List[Optional[str]] = [None] * len(rows)
+    pending = list(range(len(rows)))
+    shard = shard_picker.pick(user_id)
+
+    async with shard_session(db, shard) as links_db:
+        try:
+            for _ in range(keygen.key_allocator.max_retries + 1):
+                if not pending:
+                    break
+                keys = [shard_key(shard, key) for key in await keygen.key_allocator.allocate(db, len(pending))]
+                records = [
+                    (key, rows[position][0], f"{settings.base_url}/{key}", rows[position][1])
+                    for position, key in zip(pending, keys)
+                ]
+                inserted = await _load_chunk(links_db, records, user_id)
+
+                retry = []
+                for position, key in zip(pending, keys):
+                    if key in inserted:
+                        assigned[position] = key
+                    else:
+                        retry.append(position)
+                pending = retry
+            created = user_id is not None and len(pending) < len(rows)
+            await _bump_links_versions(db, links_db, {user_id} if created else set())
+        except SQLAlchemyError as e:
+            await links_db.rollback()
+            await db.rollback()
+            logger.error("Error copying URLs in bulk: %s", e)
+            raise e
+
+    for key in assigned:
+        if key is not None:
+            _remember_created_key(key)
+    return assigned
+
+
+def _user_links_stmt(user_id: int, cursor: Optional[int]):
+    # Columns after id are LinkRecord's fields, in order.
+    stmt = (
+        select(URL.id, URL.key, URL.short_url, URL.target_url, URL.type, URL.expires_at)
+        .filter(URL.user_id == user_id, URL.is_active == True)
+        .order_by(URL.id)
+    )
+    if cursor is not None:
+        stmt = stmt.filter(URL.id > cursor)
+    return stmt
 
 
-async def fetch_user_links(db: AsyncSession, user_id: int) -> List[dict]:
+def _link_record(row) -> LinkRecord:
+    return LinkRecord(*row[1:])
+
+
+async def fetch_user_links(
+    db: AsyncSession, user_id: int, limit: int, cursor: Optional[int] = None
+) -> Tuple[List[LinkRecord], Optional[int]]:
+    """
+    Fetch one page of a user's active links ordered by id, starting after `cursor`.
+    Returns the page and the cursor for the next one, or None on the last page.
+    """
+    if sharded():
+        return await _fetch_sharded_user_links(db, user_id, limit, cursor)
+    try:
+        result = await db.execute(_user_links_stmt(user_id, cursor).limit(limit + 1))
+        rows = result.all()
+    except SQLAlchemyError as e:
+        logger.error("Error fetching user links: %s", e)
+        raise e
+
+    next_cursor = rows[limit - 1].id if len(rows) > limit else None
+    logger.info("User links have been successfully fetched: %d links for user %s", min(len(rows), limit), user_id)
+    return [_link_record(row) for row in rows[:limit]], next_cursor
+
+
+async def _fetch_sharded_user_links(
+    db: AsyncSession, user_id: int, limit: int, cursor: Optional[int]
+) -> Tuple[List[LinkRecord], Optional[int]]:
+    """
+    Query every shard for its next `limit + 1` links concurrently and merge them by (id, shard).
+    Ids are only unique per shard, so the cursor carries the shard of the last row as well.
+    """
+    after_id, after_shard = decode_cursor(cursor) if cursor is not None else (None, 0)
+
+    async def fetch_shard(shard: int) -> List[Tuple[int, int, Any]]:
+        stmt = _user_links_stmt(user_id, None)
+        if after_id is not None:
+            # Shards after the cursor's still owe their rows with the cursor's id.
+            stmt = stmt.filter(URL.id >= after_id if shard > after_shard else URL.id > after_id)
+        async with shard_session(db, shard) as links_db:
+            rows = (await links_db.execute(stmt.limit(limit + 1))).all()
+        return [(row.id, shard, row) for row in rows]
+
     try:
-        result = await db.execute(select(URL).filter(URL.user_id == user_id, URL.is_active == True))
-        links = result.scalars().all()
+        pages = await asyncio.gather(*(fetch_shard(shard) for shard in range(shard_count)))
     except SQLAlchemyError as e:
         logger.error("Error fetching user links: %s", e)
         raise e
 
-    logger.info("User links have been successfully fetched: %s", links)
-    return [
-        {"key": link.key, "short_url": link.short_url, "original_url": link.target_url, "type": link.type}
-        for link in links
-    ]
+    merged = list(heapq.merge(*pages, key=lambda item: item[:2]))[: limit + 1]
+    next_cursor = encode_cursor(*merged[limit - 1][:2]) if len(merged) > limit else None
+    logger.info("User links have been successfully fetched: %d links for user %s", min(len(merged), limit), user_id)
+    return [_link_record(row) for _, _, row in merged[:limit]], next_cursor
+
+
+async def stream_user_links(
+    db: AsyncSession, user_id: int, cursor: Optional[int] = None
+) -> AsyncIterator[List[LinkRecord]]:
+    """
+    Yield all of a user's active links from a server-side cursor in chunks of `status_stream_chunk_size`,
+    holding at most one chunk of rows in memory at a time. With several shards, pages through the
+    merged listing.
+    """
+    if sharded():
+        while True:
+            links, cursor = await fetch_user_links(db, user_id, settings.status_stream_chunk_size, cursor)
+            if links:
+                yield links
+            if cursor is None:
+                return
+
+    stmt = _user_links_stmt(user_id, cursor).execution_options(yield_per=settings.status_stream_chunk_size)
+    try:
+        result = await db.stream(stmt)
+        async for rows in result.partitions():
+            yield [_link_record(row) for row in rows]
+    except SQLAlchemyError as e:
+        logger.error("Error streaming user links: %s", e)
+        raise e
+
+
+EXPORT_COLUMNS = ("key", "short_url", "target_url", "type", "user_id", "is_active")
+
+
+async def stream_links_export(db: AsyncSession, user_id: Optional[int] = None) -> AsyncIterator[List[tuple]]:
+    """
+    Yield EXPORT_COLUMNS rows in chunks of `transfer_chunk_size` from a server-side cursor: the user's
+    active links, or every link when `user_id` is None. Shards are exported one after another.
+    """
+    stmt = select(*(getattr(URL, name) for name in EXPORT_COLUMNS)).order_by(URL.id)
+    if user_id is not None:
+        stmt = stmt.filter(URL.user_id == user_id, URL.is_active == True)
+    try:
+        for shard in range(shard_count):
+            async with shard_session(db, shard) as links_db:
+                result = await links_db.stream(stmt.execution_options(yield_per=settings.transfer_chunk_size))
+                async for rows in result.partitions():
+                    yield rows
+    except SQLAlchemyError as e:
+        logger.error("Error exporting links: %s", e)
+        raise e
 
 
 async def get_db_url_by_key(db: AsyncSession, key: str) -> Optional[URL]:
+    if await is_known_missing(key):
+        return None
+
     try:
-        result = await db.execute(select(URL).filter(URL.key == key))
-        url = result.scalars().first()
+        # A deactivated link reads as not found.
+        async with shard_session(db, shard_for_key(key)) as links_db:
+            row = await fetch_first(links_db, select(URL).filter(URL.key == key, URL.is_active == True))
+        url = row[0] if row else None
     except SQLAlchemyError as e:
         logger.error("Error fetching URL by key: %s", e)
         raise e
-    logger.info("URL has been successfully fetched by key: %s", url)
+
+    if url is None:
+        missing_key_cache.set(key, True)
+        return None
+    logger.info("URL has been successfully fetched by key: %s", key)
     return url
 
 
-async def deactivate_db_url_by_key(db: AsyncSession, key: str, user_id: int) -> Optional[dict]:
+def get_cached_redirect(key: str) -> Optional[RedirectEntry]:
+    return redirect_cache.get(key)
+
+
+def _redirect_entry(url) -> RedirectEntry:
+    return RedirectEntry(
+        target_url=url.target_url,
+        type=url.type,
+        user_id=url.user_id,
+        is_active=url.is_active,
+        expires_at=unix_time(url.expires_at),
+    )
+
+
+async def load_redirect_by_key(db: AsyncSession, key: str) -> Optional[RedirectEntry]:
+    """
+    Load a short key from the database and store it in the redirect cache.
+    Called only on a cache miss, so cache hits never check out a connection; concurrent misses
+    for the same key wait on the first one's query, on that caller's session.
+    """
+
+    async def load() -> Optional[RedirectEntry]:
+        url = await get_db_url_by_key(db, key)
+        if not url:
+            return None
+        entry = _redirect_entry(url)
+        redirect_cache.set(key, entry)
+        return entry
+
+    return await key_lookups.do(key, load)
+
+
+async def preload_redirect_cache(
+    db: AsyncSession,
+    limit: int = settings.redirect_cache_preload_size,
+    source: str = settings.redirect_cache_preload_source,
+    days: int = settings.redirect_cache_preload_days,
+) -> int:
+    """
+    Fill the redirect cache with up to `limit` live links: the most clicked over the last `days`
+    days by the daily rollups (`clicks`), or the most recently created on each shard (`recent`).
+    Returns the number of links cached.
+    """
+    limit = min(limit, settings.redirect_cache_size)
+    if limit <= 0:
+        return 0
+    columns = (URL.key, URL.target_url, URL.type, URL.user_id, URL.is_active, URL.expires_at)
     try:
-        result = await db.execute(select(URL).filter(URL.key == key, URL.user_id == user_id))
-        db_url = result.scalars().first()
+        if source == "recent":
+            per_shard = -(-limit // shard_count)
+            stmt = select(*columns).filter(URL.is_active == True).order_by(URL.id.desc()).limit(per_shard)
+            statements = {shard: stmt for shard in range(shard_count)}
+        else:
+            since = datetime.now(timezone.utc) - timedelta(days=days)
+            hot_keys = (
+                await db.execute(
+                    select(ClickRollupDaily.key)
+                    .filter(ClickRollupDaily.bucket >= since)
+                    .group_by(ClickRollupDaily.key)
+                    .order_by(func.sum(ClickRollupDaily.clicks).desc())
+                    .limit(limit)
+                )
+            ).scalars().all()
+            by_shard = {}
+            for key in hot_keys:
+                by_shard.setdefault(shard_for_key(key), []).append(key)
+            statements = {
+                shard: select(*columns).filter(URL.key.in_(keys), URL.is_active == True)
+                for shard, keys in by_shard.items()
+            }
+
+        loaded = 0
+        for shard, stmt in statements.items():
+            async with shard_session(db, shard) as links_db:
+                for url in (await links_db.execute(stmt)).all():
+                    redirect_cache.set(url.key, _redirect_entry(url))
+                    loaded += 1
+    except SQLAlchemyError as e:
+        logger.error("Error preloading redirect cache: %s", e)
+        raise e
+
+    logger.info("Redirect cache preloaded with %d links by %s", loaded, source)
+    return loaded
 
-        if db_url:
-            db_url.is_active = False
-            await db.commit()
-            return {"message": "URL has been successfully deactivated"}
+
+async def deactivate_db_url_by_key(db: AsyncSession, key: str, user_id: int) -> Optional[dict]:
+    """
+    Deactivate the user's link in a single UPDATE ... RETURNING; ownership is part of the WHERE clause
+    and the owner's links_version is bumped in the same statement (after it, for keys on another shard).
+    A link that is already inactive is reported as deactivated, at the cost of one indexed lookup.
+    Returns None when the key does not exist or belongs to someone else.
+    """
+    stmt = (
+        update(URL)
+        .where(URL.key == key, URL.user_id == user_id, URL.is_active == True)
+        .values(is_active=False, deactivated_at=func.now())
+        .returning(URL.key, URL.user_id)
+        .execution_options(synchronize_session=False)
+    )
+    try:
+        async with shard_session(db, shard_for_key(key)) as links_db:
+            if links_db is db and _writable_ctes(db):
+                deactivated = stmt.cte("deactivated")
+                stmt = (
+                    update(User)
+                    .where(User.id == deactivated.c.user_id)
+                    .values(links_version=User.links_version + 1)
+                    .returning(deactivated.c.key)
+                    .execution_options(synchronize_session=False)
+                )
+                deactivated = (await db.execute(stmt)).scalar_one_or_none()
+                await db.commit()
+            else:
+                deactivated = (await links_db.execute(stmt)).scalar_one_or_none()
+                await _bump_links_versions(db, links_db, {user_id} if deactivated is not None else set())
+            if deactivated is None:
+                # Deleting a link again succeeds as it always has; only keys the user never had are missing.
+                owned = await fetch_first(
+                    links_db, select(URL.id).filter(URL.key == key, URL.user_id == user_id, URL.is_active == False)
+                )
     except SQLAlchemyError as e:
         await db.rollback()
         logger.error("Error deactivating URL by key: %s", e)
         raise e
-    logger.info("URL has been successfully deactivated by key: %s", db_url)
-    return None
+
+    if deactivated is None:
+        return {"message": "URL has been successfully deactivated"} if owned else None
+
+    redirect_cache.invalidate(key)
+    if settings.redirect_snapshot_enabled:
+        redirect_snapshot_for(key).deactivate(key)
+    logger.info("URL has been successfully deactivated by key: %s", key)
+    return {"message": "URL has been successfully deactivated"}
+
+
+async def deactivate_expired_urls(db: AsyncSession, limit: int, shard: int = 0) -> List[Tuple[str, Optional[int]]]:
+    """
+    Deactivate up to `limit` links on `shard` past their expires_at, oldest expiry first, and bump their
+    owners' links_version on the primary `db`, in one short transaction per database. Rows locked by
+    another sweeper are skipped rather than waited for. Returns the (key, user_id) pairs deactivated.
+    """
+    now = datetime.now(timezone.utc)
+    batch = (
+        select(URL.id)
+        .filter(URL.is_active == True, URL.expires_at <= now)
+        .order_by(URL.expires_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    stmt = (
+        update(URL)
+        .where(URL.id.in_(batch.scalar_subquery()))
+        .values(is_active=False, deactivated_at=now)
+        .returning(URL.key, URL.user_id)
+        .execution_options(synchronize_session=False)
+    )
+    try:
+        async with shard_session(db, shard) as links_db:
+            expired = [tuple(row) for row in (await links_db.execute(stmt)).all()]
+            await _bump_links_versions(db, links_db, {user_id for _, user_id in expired if user_id is not None})
+    except SQLAlchemyError as e:
+        await db.rollback()
+        logger.error("Error deactivating expired URLs: %s", e)
+        raise e
+
+    for key, _ in expired:
+        redirect_cache.invalidate(key)
+    return expired
+
+
+ARCHIVE_COLUMNS = ("id", "key", "target_url", "short_url", "user_id", "type", "expires_at", "deactivated_at")
+
+
+async def archive_inactive_urls(db: AsyncSession, deactivated_before: datetime, limit: int, shard: int = 0) -> int:
+    """
+    Move up to `limit` links deactivated before `deactivated_before` (or at an unknown time, before
+    deactivated_at existed) from urls to urls_archive on the same shard in one short transaction.
+    Returns the count moved.
+    """
+    batch = (
+        select(URL.id)
+        .filter(URL.is_active == False, or_(URL.deactivated_at < deactivated_before, URL.deactivated_at.is_(None)))
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    try:
+        async with shard_session(db, shard) as links_db:
+            ids = (await links_db.execute(batch)).scalars().all()
+            if ids:
+                await links_db.execute(
+                    insert(URLArchive).from_select(
+                        ARCHIVE_COLUMNS,
+                        select(*(getattr(URL, name) for name in ARCHIVE_COLUMNS)).where(URL.id.in_(ids)),
+                    )
+                )
+                await links_db.execute(delete(URL).where(URL.id.in_(ids)).execution_options(synchronize_session=False))
+            await links_db.commit()
+    except SQLAlchemyError as e:
+        await db.rollback()
+        logger.error("Error archiving inactive URLs: %s", e)
+        raise e
+    return len(ids)
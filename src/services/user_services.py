@@ -0,0 +1,83 @@
+import logging.config
+from typing import NamedTuple, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.db.db_connector import fetch_first
+from src.models.models import User
+from src.core.cache import TTLCache
+from src.core.config import settings
+from src.core.singleflight import SingleFlight
+from src.core.metrics import registry
+from src.core.logger import LOGGING
+
+
+logging.config.dictConfig(LOGGING)
+logger = logging.getLogger(__name__)
+
+# Tokens are issued by secrets.token_urlsafe(32); anything far longer is junk and never reaches the DB.
+MAX_TOKEN_LENGTH = 128
+
+
+class CachedUser(NamedTuple):
+    id: int
+    username: str
+    is_active: bool
+
+
+token_lookups = SingleFlight("token")
+
+# Unknown tokens live in their own cache so a flood of junk tokens cannot evict valid users.
+# Both caches are per process and nothing invalidates them: a user deactivated in the database keeps
+# being accepted for up to TOKEN_CACHE_TTL by every worker that has the token cached.
+token_cache = registry.track_cache(
+    TTLCache("token", maxsize=settings.token_cache_size, ttl=settings.token_cache_ttl)
+)
+invalid_token_cache = registry.track_cache(
+    TTLCache("token_negative", maxsize=settings.token_negative_cache_size, ttl=settings.token_negative_cache_ttl)
+)
+
+
+async def get_user_by_token(db: AsyncSession, token: str) -> Optional[CachedUser]:
+    """
+    Resolve a bearer token to an active user, consulting the positive and negative token caches
+    before the database. Concurrent lookups of the same uncached token share one query.
+    """
+    user = token_cache.get(token)
+    if user is not None:
+        return user
+    if len(token) > MAX_TOKEN_LENGTH or invalid_token_cache.get(token) is not None:
+        return None
+    return await token_lookups.do(token, lambda: _load_user_by_token(db, token))
+
+
+async def _load_user_by_token(db: AsyncSession, token: str) -> Optional[CachedUser]:
+    try:
+        row = await fetch_first(
+            db, select(User.id, User.username, User.is_active).filter(User.token == token, User.is_active == True)
+        )
+    except SQLAlchemyError as e:
+        logger.error("Error fetching user by token: %s", e)
+        raise e
+
+    if row is None:
+        invalid_token_cache.set(token, True)
+        return None
+
+    user = CachedUser(id=row.id, username=row.username, is_active=row.is_active)
+    token_cache.set(token, user)
+    return user
+
+
+async def get_links_version(db: AsyncSession, user_id: int) -> int:
+    """
+    The user's links_version, bumped on every create or deactivation; one primary-key lookup.
+    """
+    try:
+        result = await db.execute(select(User.links_version).filter(User.id == user_id))
+    except SQLAlchemyError as e:
+        logger.error("Error fetching links version: %s", e)
+        raise e
+    return result.scalar_one_or_none() or 0
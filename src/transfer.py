@@ -0,0 +1,97 @@
+"""
+Bulk import and export of links for moving tenants in and out of the service.
+
+    python -m src.transfer import links.csv --username alice
+    python -m src.transfer import - --format ndjson < links.ndjson
+    python -m src.transfer export --output all_links.csv
+    python -m src.transfer export --username alice --format ndjson
+
+Import reads the file in chunks and loads it like POST /v1/url/import, printing progress to stderr
+and the report to stdout. Export without --username dumps every link, active or not, which is why
+it is only available here, to operators with database access.
+"""
+import argparse
+import asyncio
+import json
+import sys
+from typing import AsyncIterator, BinaryIO, Optional
+
+from sqlalchemy.future import select
+
+from src.db.db_connector import async_session, dispose_engines
+from src.models.models import User
+from src.services.transfer_services import TRANSFER_FORMATS, export_links, import_links
+
+READ_SIZE = 1 << 16
+
+
+async def read_chunks(source: BinaryIO) -> AsyncIterator[bytes]:
+    while True:
+        chunk = source.read(READ_SIZE)
+        if not chunk:
+            return
+        yield chunk
+
+
+def print_progress(report: dict) -> None:
+    print(
+        f"{report['rows']} rows read, {report['imported']} imported, {report['rejected']} rejected",
+        file=sys.stderr,
+    )
+
+
+async def user_id_for(db, username: Optional[str]) -> Optional[int]:
+    if username is None:
+        return None
+    user_id = (await db.execute(select(User.id).filter(User.username == username))).scalar_one_or_none()
+    if user_id is None:
+        raise SystemExit(f"No such user: {username}")
+    return user_id
+
+
+async def run_import(args: argparse.Namespace) -> None:
+    source = sys.stdin.buffer if args.path == "-" else open(args.path, "rb")
+    try:
+        async with async_session() as db:
+            user_id = await user_id_for(db, args.username)
+            report = await import_links(db, read_chunks(source), args.format, user_id, on_progress=print_progress)
+    finally:
+        if source is not sys.stdin.buffer:
+            source.close()
+    print(json.dumps(report, indent=2))
+
+
+async def run_export(args: argparse.Namespace) -> None:
+    target = sys.stdout if args.output == "-" else open(args.output, "w", newline="")
+    try:
+        async with async_session() as db:
+            user_id = await user_id_for(db, args.username)
+            async for chunk in export_links(db, args.format, user_id):
+                target.write(chunk)
+    finally:
+        if target is not sys.stdout:
+            target.close()
+
+
+async def main(args: argparse.Namespace) -> None:
+    try:
+        await (run_import(args) if args.command == "import" else run_export(args))
+    finally:
+        await dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = commands.add_parser("import", help="Import links from a CSV or NDJSON file ('-' for stdin).")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--username", help="Owner of the imported links; without it they have none.")
+    import_parser.add_argument("--format", choices=TRANSFER_FORMATS, default="csv")
+
+    export_parser = commands.add_parser("export", help="Export links as CSV or NDJSON.")
+    export_parser.add_argument("--username", help="Export only this user's active links.")
+    export_parser.add_argument("--output", default="-", help="File to write, '-' for stdout.")
+    export_parser.add_argument("--format", choices=TRANSFER_FORMATS, default="csv")
+
+    asyncio.run(main(parser.parse_args()))
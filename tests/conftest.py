@@ -1,15 +1,70 @@
+import asyncio
 import os
 import random
+import socket
 import string
+import threading
+import time
 import pytest
 import requests
 from dotenv import load_dotenv
 
 load_dotenv()
 
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _serve_in_process():
+    """
+    Serve the app from a uvicorn thread in this process, by default on the in-memory storage backend.
+    Settings are read when `src` is first imported, so the environment is set before that.
+    """
+    port = _free_port()
+    os.environ.setdefault("STORAGE_BACKEND", "memory")
+    os.environ["BASE_URL"] = f"http://127.0.0.1:{port}/r"
+
+    import uvicorn
+    from src.main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 30
+    while not server.started:
+        assert thread.is_alive() and time.monotonic() < deadline, "in-process server failed to start"
+        time.sleep(0.05)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
 @pytest.fixture(scope="session")
 def server_url():
-    return os.getenv("SERVER_URL", "http://localhost:8000")
+    # Without SERVER_URL the suite runs against an in-process server instead of a deployed stack.
+    if os.getenv("SERVER_URL"):
+        yield os.environ["SERVER_URL"]
+    else:
+        yield from _serve_in_process()
+
+
+@pytest.fixture(scope="session")
+def storage_backend(server_url):
+    return os.getenv("STORAGE_BACKEND", "postgres")
+
+
+@pytest.fixture(scope="session")
+def shard_count(server_url):
+    # The server's urls shards, counted from the connection pools it reports
+    prefix = 'db_pool_connections{db="shard'
+    metrics = requests.get(f"{server_url}/metrics").text.splitlines()
+    return 1 + sum(1 for line in metrics if line.startswith(prefix) and 'state="size"' in line)
+
 
 @pytest.fixture(scope="session")
 def user_token(server_url):
@@ -18,3 +73,46 @@ def user_token(server_url):
     response = requests.post(f"{server_url}/v1/user/registration", json=user_data)
     assert response.status_code == 201
     return response.json().get("token")
+
+
+@pytest.fixture
+def run_with_database(server_url):
+    """
+    Run an async test function on a fresh in-memory database with the app's schema, passing it a
+    session factory. `src` reads its settings on first import, so it is only imported once the
+    server fixture has set them.
+    """
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from sqlalchemy.orm import sessionmaker
+    from src.db.db_connector import MEMORY_DATABASE_URL, Base, build_engine
+
+    def run_with_database(test):
+        async def run():
+            engine = build_engine(MEMORY_DATABASE_URL)
+            try:
+                async with engine.begin() as conn:
+                    await conn.run_sync(Base.metadata.create_all)
+                await test(sessionmaker(engine, class_=AsyncSession, expire_on_commit=False))
+            finally:
+                await engine.dispose()
+
+        asyncio.run(run())
+
+    return run_with_database
+
+
+@pytest.fixture
+def add_links():
+    """
+    Insert active links, given as key=id, through a session factory from `run_with_database`.
+    """
+    from src.models.models import URL
+
+    async def add_links(session_factory, **ids):
+        async with session_factory() as session:
+            session.add_all(
+                [URL(id=id_, key=key, target_url=f"https://{key}.example.com") for key, id_ in ids.items()]
+            )
+            await session.commit()
+
+    return add_links
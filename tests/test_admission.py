@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+
+@pytest.mark.parametrize(
+    "method, path, expected",
+    [
+        ("GET", "/r/abc123", "redirect"),
+        ("GET", "/v1/ping", "health"),
+        ("POST", "/v1/user/registration", "registration"),
+        ("GET", "/v1/user/status", "listing"),
+        ("GET", "/v1/url/export", "listing"),
+        ("GET", "/v1/url/abc123/stats", "listing"),
+        ("POST", "/v1/url", "write"),
+        ("POST", "/v1/url/batch", "write"),
+        ("POST", "/v1/url/import", "write"),
+        ("DELETE", "/v1/url/abc123", "write"),
+        ("GET", "/v1/url/abc123", None),
+        ("GET", "/metrics", None),
+        ("GET", "/docs", None),
+    ],
+)
+def test_route_class(server_url, method, path, expected):
+    from src.core.admission import route_class
+
+    assert route_class(method, path) == expected
+
+
+def test_concurrency_limit_queue_and_timeout(server_url):
+    from src.core.admission import ConcurrencyLimit
+
+    async def test():
+        limit = ConcurrencyLimit("test", limit=1, queue_size=1, queue_timeout=0.05)
+        assert await limit.acquire()
+
+        # The second request waits for the slot, the third finds the queue full.
+        waiting = asyncio.ensure_future(limit.acquire())
+        await asyncio.sleep(0)
+        assert limit.queued == 1
+        assert not await limit.acquire()
+        assert limit.rejected == 1
+
+        limit.release()
+        assert await waiting
+        assert (limit.active, limit.queued) == (1, 0)
+
+        # Nobody releases this time; the waiter gives up after queue_timeout.
+        assert not await limit.acquire()
+        assert limit.timed_out == 1
+        assert limit.queued == 0
+
+        limit.release()
+        assert limit.active == 0
+        assert limit.admitted == 2
+
+    asyncio.run(test())
+
+
+def test_admission_middleware_sheds_load(server_url, monkeypatch):
+    from src.core import admission
+    from src.core.config import settings
+
+    monkeypatch.setattr(settings, "admission_enabled", True)
+
+    async def test():
+        monkeypatch.setitem(admission.limits, "write", admission.ConcurrencyLimit("write", 2, 1, 0.05))
+        release = asyncio.Event()
+
+        async def app(scope, receive, send):
+            await release.wait()
+            await send({"type": "http.response.start", "status": 201, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+
+        middleware = admission.AdmissionControlMiddleware(app)
+
+        async def request():
+            messages = []
+
+            async def send(message):
+                messages.append(message)
+
+            await middleware({"type": "http", "method": "POST", "path": "/v1/url"}, None, send)
+            start = messages[0]
+            return start["status"], dict(start["headers"])
+
+        # Two requests take the slots and one waits; the fourth is turned away at once.
+        held = [asyncio.ensure_future(request()) for _ in range(3)]
+        await asyncio.sleep(0)
+        status, headers = await request()
+        assert status == 503
+        assert headers[b"retry-after"] == str(settings.admission_retry_after).encode()
+        assert headers[b"content-type"] == b"application/json"
+
+        # The waiter times out with the same answer; the two in flight complete.
+        release_later = asyncio.get_running_loop().call_later(0.1, release.set)
+        results = await asyncio.gather(*held)
+        release_later.cancel()
+        assert sorted(status for status, _ in results) == [201, 201, 503]
+        assert admission.limits["write"].active == 0
+
+    asyncio.run(test())
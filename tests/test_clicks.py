@@ -0,0 +1,30 @@
+import hashlib
+
+from sqlalchemy.future import select
+
+
+def test_redirect_click_records_salted_ip_hash(run_with_database, monkeypatch):
+    from src.models.models import Click
+    from src.services import redirect_services
+    from src.services.click_services import ClickRecorder, hash_client_ip
+
+    client_ip = "203.0.113.7"
+
+    async def test(session_factory):
+        recorder = ClickRecorder(session_factory=session_factory, flush_interval=0.01)
+        monkeypatch.setattr(redirect_services, "click_recorder", recorder)
+        recorder.start()
+        # What the redirect route calls once it has answered.
+        redirect_services.record_click("clicked", "test-agent", "https://referrer.example.com/page", client_ip)
+        await recorder.stop()
+
+        async with session_factory() as session:
+            clicks = (await session.execute(select(Click))).scalars().all()
+        assert [(click.key, click.user_agent) for click in clicks] == [("clicked", "test-agent")]
+        ip_hash = clicks[0].ip_hash
+        assert ip_hash == hash_client_ip(client_ip)
+        assert len(ip_hash) == 32 and client_ip not in ip_hash
+        # Salted, so it cannot be matched against hashes of every address.
+        assert ip_hash != hashlib.blake2b(client_ip.encode(), digest_size=16).hexdigest()
+
+    run_with_database(test)
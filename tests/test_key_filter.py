@@ -0,0 +1,91 @@
+import asyncio
+from datetime import timedelta
+
+from sqlalchemy import update
+
+
+async def set_created_at(session_factory, key, created_at):
+    from src.models.models import URL
+
+    async with session_factory() as session:
+        await session.execute(update(URL).where(URL.key == key).values(created_at=created_at))
+        await session.commit()
+
+
+def test_key_filter_late_commits(run_with_database, add_links):
+    from src.services.key_filter import CREATION_OVERLAP, KeyFilter
+
+    async def test(session_factory):
+        await add_links(session_factory, first=1, newest=2)
+        key_filter = KeyFilter(session_factory=session_factory, capacity=1000)
+        await key_filter.build()
+        built = key_filter.watermark
+        assert built is not None
+
+        # Committed after the build by transactions that started before it: one within the overlap,
+        # one longer ago, as a transaction outlasting the overlap would.
+        await add_links(session_factory, late=3, very_late=4)
+        await set_created_at(session_factory, "late", built - CREATION_OVERLAP / 2)
+        await set_created_at(session_factory, "very_late", built - CREATION_OVERLAP * 2)
+        await key_filter.refresh()
+        assert key_filter.might_contain("late")
+        assert key_filter.watermark == built
+
+        # The periodic rebuild picks up whatever the overlap missed.
+        await key_filter.build()
+        assert key_filter.might_contain("very_late")
+
+    run_with_database(test)
+
+
+def test_key_filter_watermark_never_moves_down(run_with_database, add_links):
+    from src.models.models import URL
+    from src.services.key_filter import KeyFilter
+
+    async def test(session_factory):
+        await add_links(session_factory, first=1, second=2)
+        key_filter = KeyFilter(session_factory=session_factory, capacity=1000)
+        await key_filter.build()
+        watermark = key_filter.watermark
+        await add_links(session_factory, third=3)
+        await set_created_at(session_factory, "third", watermark + timedelta(seconds=5))
+        await key_filter.refresh()
+        assert key_filter.watermark == watermark + timedelta(seconds=5)
+
+        # The newest links deactivated, the next poll comes back empty.
+        async with session_factory() as session:
+            await session.execute(update(URL).values(is_active=False))
+            await session.commit()
+        await key_filter.refresh()
+        assert key_filter.watermark == watermark + timedelta(seconds=5)
+
+    run_with_database(test)
+
+
+def test_key_filter_miss_polls_before_rejecting(run_with_database, add_links, monkeypatch):
+    from src.services import url_services
+    from src.services.key_filter import KeyFilter, key_filter_polls
+
+    async def test(session_factory):
+        key_filter = KeyFilter(session_factory=session_factory, capacity=1000)
+        await key_filter.build()
+        monkeypatch.setattr(url_services, "key_filter_for", lambda key: key_filter)
+        url_services.missing_key_cache.invalidate("elsewhere")
+        url_services.missing_key_cache.invalidate("never_created")
+
+        # Created by another worker since the last poll: the filter does not know it, the poll does.
+        await add_links(session_factory, elsewhere=1)
+        assert not key_filter.might_contain("elsewhere")
+        assert not await url_services.is_known_missing("elsewhere")
+        assert key_filter.might_contain("elsewhere")
+
+        # Misses arriving while a poll runs wait for the next one, all of them together; the same key
+        # again is answered by the negative cache.
+        leaders = key_filter_polls.leaders
+        results = await asyncio.gather(*(url_services.is_known_missing("never_created") for _ in range(5)))
+        assert results == [True] * 5
+        assert key_filter_polls.leaders == leaders + 2
+        assert await url_services.is_known_missing("never_created")
+        assert key_filter_polls.leaders == leaders + 2
+
+    run_with_database(test)
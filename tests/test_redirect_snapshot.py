@@ -0,0 +1,128 @@
+import asyncio
+import os
+import stat
+
+from sqlalchemy import func, update
+
+
+def test_snapshot_table(tmp_path):
+    from src.services.redirect_snapshot import _Table
+
+    path = tmp_path / "snapshot"
+    table = _Table.create(str(path), capacity=4, heap_size=4096)
+    # Private link targets and owners: readable by the app's user only.
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert table.insert(b"public", b"https://public.example.com", "public", None)
+    assert table.insert(b"private", b"https://private.example.com", "private", 7, expires_at=2e9)
+    # Inserting a key again keeps the first entry.
+    assert table.insert(b"public", b"https://other.example.com", "public", None)
+    assert table.header()[3] == 2
+
+    entry = table.entry(table.find(b"private"))
+    assert (entry.target_url, entry.type, entry.user_id) == ("https://private.example.com", "private", 7)
+    assert entry.is_active
+    assert entry.expires_at == 2e9
+    assert table.entry(table.find(b"public")).user_id is None
+    assert table.find(b"missing") == 0
+
+    assert table.deactivate(b"public")
+    assert not table.deactivate(b"missing")
+    assert not table.entry(table.find(b"public")).is_active
+    assert list(table.inactive_keys()) == [b"public"]
+
+    # Slots are kept at most half full; a full table asks to be rebuilt larger.
+    inserted = [table.insert(f"key{index}".encode(), b"https://example.com", "public", None) for index in range(16)]
+    assert False in inserted
+    table.close()
+
+
+def test_snapshot_leader_lock(tmp_path):
+    from src.services.redirect_snapshot import RedirectSnapshot
+
+    path = str(tmp_path / "snapshot")
+    first, second = RedirectSnapshot(path=path), RedirectSnapshot(path=path)
+
+    assert first._try_lead()
+    assert stat.S_IMODE(os.stat(f"{path}.lock").st_mode) == 0o600
+    assert not second._try_lead()
+    assert first.leader and not second.leader
+
+    # The lock goes with the leader; the next worker to try takes over.
+    asyncio.run(first.stop())
+    assert not first.leader
+    assert second._try_lead()
+    asyncio.run(second.stop())
+
+
+def test_snapshot_rebuild_swap(run_with_database, add_links, tmp_path):
+    from src.services.redirect_snapshot import RedirectSnapshot
+
+    path = str(tmp_path / "snapshot")
+
+    async def test(session_factory):
+        await add_links(session_factory, first=1, second=2)
+        leader = RedirectSnapshot(session_factory=session_factory, path=path, capacity=16)
+        reader = RedirectSnapshot(session_factory=session_factory, path=path)
+        await leader.rebuild()
+        reader._remap()
+        assert reader.get("first").target_url == "https://first.example.com"
+        assert reader.get("third") is None
+
+        # Deactivated by a reader in the old file while the leader rebuilds, and created meanwhile.
+        reader.deactivate("second")
+        await add_links(session_factory, third=3)
+        await leader.rebuild()
+
+        assert reader._table.retired
+        assert reader.get("third").target_url == "https://third.example.com"
+        assert not reader._table.retired
+        assert not reader.get("second").is_active
+        assert reader.get("first").is_active
+
+        await leader.stop()
+        await reader.stop()
+        reader._table.close()
+        leader._table.close()
+
+    run_with_database(test)
+
+
+def test_snapshot_refresh_polls_deactivations(run_with_database, add_links, tmp_path):
+    from src.models.models import URL
+    from src.services.redirect_entry import unix_time
+    from src.services.redirect_snapshot import RedirectSnapshot
+
+    async def test(session_factory):
+        await add_links(session_factory, first=1, second=2)
+        snapshot = RedirectSnapshot(session_factory=session_factory, path=str(tmp_path / "snapshot"), capacity=16)
+        await snapshot.rebuild()
+        assert snapshot.get("second").is_active
+
+        async def deactivate(key):
+            # Straight in the database, as by a worker on another host.
+            async with session_factory() as session:
+                await session.execute(
+                    update(URL).where(URL.key == key).values(is_active=False, deactivated_at=func.now())
+                )
+                await session.commit()
+
+        await deactivate("second")
+        await add_links(session_factory, third=3)
+        await snapshot.refresh()
+        assert not snapshot.get("second").is_active
+        assert snapshot.get("first").is_active
+        assert snapshot.get("third").is_active
+        # The header's watermark is the newest created_at loaded.
+        assert snapshot._table.header()[6] == int(unix_time(snapshot._created_at) * 1_000_000)
+
+        # Later polls only look at deactivations since the newest one seen.
+        assert snapshot._deactivated_at is not None
+        await deactivate("third")
+        await snapshot.refresh()
+        assert not snapshot.get("third").is_active
+        assert snapshot.get("first").is_active
+
+        await snapshot.stop()
+        snapshot._table.close()
+
+    run_with_database(test)
@@ -0,0 +1,105 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+# Ids repeat across shards; the listing orders by (id, shard).
+SHARD_IDS = {0: [1, 2, 5], 1: [1, 3, 5], 2: [2, 5, 6]}
+EXPECTED = [(1, 0), (1, 1), (2, 0), (2, 2), (3, 1), (5, 0), (5, 1), (5, 2), (6, 2)]
+
+
+@pytest.fixture
+def sharded_links(server_url, monkeypatch):
+    """
+    Run an async test against three in-memory shards holding user 1's links at SHARD_IDS, with
+    the app's sharding helpers pointed at them. Each shard also has an inactive link and one of
+    another user, neither of which may be listed.
+    """
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from sqlalchemy.orm import sessionmaker
+    from src.db import sharding
+    from src.db.db_connector import MEMORY_DATABASE_URL, Base, build_engine
+    from src.models.models import URL
+    from src.services import url_services
+
+    def run(test):
+        async def setup_and_run():
+            engines = [build_engine(MEMORY_DATABASE_URL) for _ in SHARD_IDS]
+            factories = [sessionmaker(engine, class_=AsyncSession, expire_on_commit=False) for engine in engines]
+
+            @asynccontextmanager
+            async def shard_session(db, shard):
+                async with factories[shard]() as session:
+                    yield session
+
+            monkeypatch.setattr(sharding, "shard_count", len(SHARD_IDS))
+            monkeypatch.setattr(url_services, "shard_count", len(SHARD_IDS))
+            monkeypatch.setattr(url_services, "shard_session", shard_session)
+            try:
+                for shard, ids in SHARD_IDS.items():
+                    async with engines[shard].begin() as conn:
+                        await conn.run_sync(Base.metadata.create_all)
+                    async with factories[shard]() as session:
+                        session.add_all([_link(URL, shard, id_, user_id=1) for id_ in ids])
+                        session.add(_link(URL, shard, 4, user_id=1, is_active=False))
+                        session.add(_link(URL, shard, 7, user_id=2))
+                        await session.commit()
+                await test()
+            finally:
+                for engine in engines:
+                    await engine.dispose()
+
+        asyncio.run(setup_and_run())
+
+    return run
+
+
+def _link(model, shard, id_, user_id, is_active=True):
+    key = f"{shard}-{id_}-{user_id}"
+    return model(
+        id=id_,
+        key=key,
+        short_url=f"/r/{key}",
+        target_url=f"https://{key}.example.com",
+        user_id=user_id,
+        is_active=is_active,
+    )
+
+
+def test_sharded_user_links_pagination(sharded_links):
+    from src.db.sharding import MAX_SHARDS, decode_cursor, encode_cursor
+    from src.services.url_services import fetch_user_links
+
+    async def test():
+        listed, cursors, cursor = [], [], None
+        while True:
+            links, cursor = await fetch_user_links(None, 1, 2, cursor)
+            assert len(links) <= 2
+            listed.extend(links)
+            if cursor is None:
+                break
+            cursors.append(cursor)
+
+        # Every link exactly once, in (id, shard) order, across page boundaries within one id.
+        assert [link.key for link in listed] == [f"{shard}-{id_}-1" for id_, shard in EXPECTED]
+        # Each cursor is the last listed link's id * 62 + shard.
+        assert MAX_SHARDS == 62
+        assert cursors == [id_ * 62 + shard for id_, shard in EXPECTED[1:-1:2]]
+        assert [decode_cursor(cursor) for cursor in cursors] == EXPECTED[1:-1:2]
+        assert encode_cursor(5, 2) == 5 * 62 + 2
+
+        # One page holding everything has no next cursor.
+        links, cursor = await fetch_user_links(None, 1, len(EXPECTED))
+        assert len(links) == len(EXPECTED) and cursor is None
+
+    sharded_links(test)
+
+
+def test_sharded_user_links_stream(sharded_links):
+    from src.services.url_services import stream_user_links
+
+    async def test():
+        streamed = [link.key async for chunk in stream_user_links(None, 1) for link in chunk]
+        assert streamed == [f"{shard}-{id_}-1" for id_, shard in EXPECTED]
+
+    sharded_links(test)
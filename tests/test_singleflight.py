@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+
+
+@pytest.fixture
+def flight(server_url):
+    from src.core.singleflight import SingleFlight, flights
+
+    flight = SingleFlight("test")
+    yield flight
+    flights.remove(flight)
+
+
+def test_singleflight_coalesces(flight):
+    calls = []
+
+    async def test():
+        release = asyncio.Event()
+
+        async def lookup():
+            calls.append(None)
+            await release.wait()
+            return "shared"
+
+        tasks = [asyncio.ensure_future(flight.do("key", lookup)) for _ in range(5)]
+        other = asyncio.ensure_future(flight.do("other", lookup))
+        await asyncio.sleep(0)
+        release.set()
+        assert await asyncio.gather(*tasks, other) == ["shared"] * 6
+        assert len(calls) == 2
+        assert (flight.leaders, flight.coalesced) == (2, 4)
+
+        # Nothing is kept once the call completes; the next one runs again.
+        assert await flight.do("key", lookup) == "shared"
+        assert len(calls) == 3
+
+    asyncio.run(test())
+
+
+def test_singleflight_shares_exceptions(flight):
+    async def test():
+        release = asyncio.Event()
+
+        async def lookup():
+            await release.wait()
+            raise LookupError("failed")
+
+        tasks = [asyncio.ensure_future(flight.do("key", lookup)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        assert all(isinstance(result, LookupError) for result in results)
+        assert (flight.leaders, flight.coalesced) == (1, 2)
+
+    asyncio.run(test())
+
+
+def test_singleflight_leader_cancelled(flight):
+    calls = []
+
+    async def test():
+        release = asyncio.Event()
+
+        async def lookup():
+            calls.append(None)
+            await release.wait()
+            return "shared"
+
+        leader = asyncio.ensure_future(flight.do("key", lookup))
+        await asyncio.sleep(0)
+        waiters = [asyncio.ensure_future(flight.do("key", lookup)) for _ in range(3)]
+        await asyncio.sleep(0)
+
+        # A waiter takes over the lookup instead of inheriting the cancellation.
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        await asyncio.sleep(0)
+        release.set()
+        assert await asyncio.gather(*waiters) == ["shared"] * 3
+        assert len(calls) == 2
+        # The waiter that took over is a leader; only the two that got its result were coalesced.
+        assert (flight.leaders, flight.coalesced) == (2, 2)
+
+    asyncio.run(test())
+
+
+def test_singleflight_waiter_cancelled(flight):
+    async def test():
+        release = asyncio.Event()
+
+        async def lookup():
+            await release.wait()
+            return "shared"
+
+        leader = asyncio.ensure_future(flight.do("key", lookup))
+        waiter = asyncio.ensure_future(flight.do("key", lookup))
+        await asyncio.sleep(0)
+
+        # A waiter going away does not cancel the call it was waiting on.
+        waiter.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        assert await leader == "shared"
+        assert waiter.cancelled()
+        assert (flight.leaders, flight.coalesced) == (1, 0)
+
+    asyncio.run(test())
@@ -0,0 +1,66 @@
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, update
+
+
+def test_keys_are_never_reissued(run_with_database, add_links, monkeypatch):
+    from src.db import keygen
+    from src.models.models import URL
+    from src.models.schemas import URLBase
+    from src.services import url_services
+
+    class Allocator(keygen.KeyAllocator):
+        max_retries = 1
+
+        def __init__(self, *keys):
+            self.keys = list(keys)
+
+        async def allocate(self, db, count=1):
+            return [self.keys.pop(0) for _ in range(count)]
+
+    async def test(session_factory):
+        @asynccontextmanager
+        async def shard_session(db, shard):
+            yield db
+
+        monkeypatch.setattr(url_services, "shard_session", shard_session)
+        monkeypatch.setattr(url_services, "shard_key", lambda shard, key: key)
+        await add_links(session_factory, deactivated=1, archived=2)
+        async with session_factory() as session:
+            await session.execute(update(URL).values(is_active=False, deactivated_at=func.now()))
+            await session.commit()
+            now = datetime.now(timezone.utc)
+            assert await url_services.archive_inactive_urls(session, now + timedelta(seconds=1), 1) == 1
+
+        # Neither the deactivated link's key nor the archived one's can be inserted again.
+        row = {"target_url": "https://new.example.com", "short_url": "/r/new", "is_active": True, "type": "public"}
+        async with session_factory() as session:
+            keys = ["deactivated", "archived", "fresh"]
+            inserted = await url_services._insert_url_rows(session, [{**row, "key": key} for key in keys])
+            assert inserted == {"fresh"}
+            await session.commit()
+
+        # A single create retries past a skipped key like past a taken one.
+        for taken in ("deactivated", "archived"):
+            monkeypatch.setattr(keygen, "key_allocator", Allocator(taken, f"after_{taken}"))
+            async with session_factory() as session:
+                url = URLBase(target_url="https://new.example.com")
+                created = await url_services._create_db_url(session, session, 0, url, None)
+            assert created.key == f"after_{taken}"
+
+    run_with_database(test)
+
+
+def test_archived_key_trigger_survives_repeated_create_all(run_with_database):
+    from src.models.models import Base
+
+    async def test(session_factory):
+        async with session_factory() as session:
+            connection = await session.connection()
+            await connection.run_sync(Base.metadata.create_all)
+            triggers = await connection.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+            assert triggers.scalars().all() == ["urls_skip_archived_key"]
+
+    run_with_database(test)
+